@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Content-addressed cache of build artifacts, shared by builds of all devices.
+
+Entries are keyed by a SHA-256: of the OTA ZIP, of a partition image
+(new_partition_info.hash in payload), or of the contents of an APK
+(apk-content, shared by all devices shipping the same APK). apk entries,
+keyed by image hash and path of an APK, hold the key of its apk-content
+entry.
+Entries are hardlinked into and out of the cache, so that a hit costs no
+copy. Files on another filesystem than the cache are not cached. As a
+build output may share its inode with a cache entry, outputs must be
+replaced (unlinked or renamed over), never truncated and rewritten in
+place.
+
+Total size is kept within a budget by evicting least recently used
+entries. Last use of an entry is recorded in its access time. Entries
+still linked from build outputs use no space of their own and are not
+counted against the budget, evicting them would free nothing.
+
+Configured with environment variables:
+    LOS_CACHE_DIR : cache directory (default: ~/.cache/lineageos-apk-extractor)
+    LOS_CACHE_SIZE : size budget, e.g. 20G (default: 0, cache disabled)
+"""
+
+import errno
+import logging
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "lineageos-apk-extractor"
+DEFAULT_CACHE_SIZE = "0"
+
+SIZE_SUFFIXES = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+KINDS = ("ota", "image", "apk", "apk-content")
+
+
+class CacheError(Exception):
+    pass
+
+
+def parse_size(text):
+    """
+    Size in bytes of text like 512M or 20G
+    """
+    match = re.fullmatch(r"\s*(\d+)\s*([KMGT]?)i?B?\s*", str(text), re.IGNORECASE)
+    if match is None:
+        raise CacheError("Invalid size %s" % text)
+    return int(match.group(1)) * SIZE_SUFFIXES[match.group(2).upper()]
+
+
+def link_or_copy(src, dest):
+    """
+    Hardlink src to dest, or copy it if they are on different filesystems
+    """
+    try:
+        os.link(src, dest)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+        shutil.copy2(src, dest)
+
+
+def replace_link(tmp, dest):
+    """
+    Rename tmp over dest. rename() does nothing if both are links to
+    the same file, tmp is removed in that case.
+    """
+    os.replace(tmp, dest)
+    if os.path.lexists(tmp):
+        os.unlink(tmp)
+
+
+class ArtifactCache(object):
+    """
+    Args:
+        root : cache directory
+        budget : maximum size of the cache in bytes
+    """
+
+    def __init__(self, root, budget):
+        self.root = Path(root)
+        self.budget = budget
+
+    @classmethod
+    def from_environment(cls):
+        """
+        Cache configured by LOS_CACHE_DIR and LOS_CACHE_SIZE,
+        None if it is disabled
+        """
+        budget = parse_size(os.environ.get("LOS_CACHE_SIZE", DEFAULT_CACHE_SIZE))
+        if budget == 0:
+            return None
+        return cls(os.environ.get("LOS_CACHE_DIR") or DEFAULT_CACHE_DIR, budget)
+
+    def path(self, kind, key):
+        key = key.lower()
+        if kind not in KINDS or not re.fullmatch(r"[0-9a-f]{64}", key):
+            raise CacheError("Invalid cache key %s/%s" % (kind, key))
+        return self.root / kind / key[:2] / key
+
+    def lookup(self, kind, key):
+        """
+        Path of entry, None if it is not cached.
+        Entry is marked as used.
+        """
+        path = self.path(kind, key)
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return None
+        os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+        return path
+
+    def restore(self, kind, key, dest):
+        """
+        Place cached entry at dest, replacing dest.
+        Returns False if it is not cached.
+        """
+        path = self.lookup(kind, key)
+        if path is None:
+            return False
+        tmp = Path(f"{dest}.cache-tmp")
+        if os.path.lexists(tmp):
+            os.unlink(tmp)
+        try:
+            link_or_copy(path, tmp)
+        except FileNotFoundError:
+            # Evicted by another build in the meantime
+            return False
+        replace_link(tmp, dest)
+        return True
+
+    def store(self, kind, key, src):
+        """
+        Add file src to the cache as entry key, then evict entries
+        over budget. Files on another filesystem than the cache are left
+        out, as they cannot be linked.
+        Returns True if src was added
+        """
+        path = self.path(kind, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if os.stat(src).st_dev != self.root.stat().st_dev:
+            logging.debug("Not caching %s, it is not on the cache filesystem", src)
+            return False
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        link_or_copy(src, tmp)
+        st = tmp.stat()
+        os.utime(tmp, ns=(time.time_ns(), st.st_mtime_ns))
+        replace_link(tmp, path)
+        self.evict()
+        return True
+
+    def store_ref(self, kind, key, ref):
+        """
+        Record ref, the key of an entry of another kind, as entry key
+        """
+        path = self.path(kind, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            f.write(ref)
+        os.replace(tmp, path)
+
+    def read_ref(self, kind, key):
+        """
+        Key recorded as entry key by store_ref, None if it is not cached
+        """
+        path = self.lookup(kind, key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                ref = f.read(65).decode("ascii", "replace").strip()
+        except FileNotFoundError:
+            return None
+        if not re.fullmatch(r"[0-9a-f]{64}", ref):
+            return None
+        return ref
+
+    def deduplicate(self, kind, key, path):
+        """
+        Replace file path with a link to entry key if it is cached,
+        otherwise add path to the cache as entry key.
+        Files on another filesystem than the cache are left alone,
+        as they cannot be linked.
+        Returns True if path was replaced by a link to an existing entry
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        if os.stat(path).st_dev != self.root.stat().st_dev:
+            return False
+        if self.restore(kind, key, path):
+            return True
+        self.store(kind, key, path)
+        return False
+
+    def entries(self):
+        """
+        (path, stat) of all entries
+        """
+        for kind in KINDS:
+            for path in self.root.glob(f"{kind}/*/*"):
+                if path.name.startswith("."):
+                    continue
+                try:
+                    yield path, path.stat()
+                except FileNotFoundError:
+                    continue
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache fits its budget.
+        Only entries not linked from elsewhere are counted and evicted.
+        """
+        entries = sorted(
+            (e for e in self.entries() if e[1].st_nlink == 1),
+            key=lambda e: e[1].st_atime_ns,
+        )
+        # Images are sparse, count allocated size
+        usage = sum(st.st_blocks * 512 for _, st in entries)
+        for path, st in entries:
+            if usage <= self.budget:
+                break
+            logging.debug("Evicting %s from cache", path)
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            usage -= st.st_blocks * 512
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+Conversion of block based OTAs (<name>.transfer.list and <name>.new.dat
+or <name>.new.dat.br) to partition images.
+
+Based on sdat2img by xpirt, luxi78 and howellzhu. Only full OTAs are
+supported, whose transfer lists consist of erase, new and zero commands.
+Data of new commands is copied in large chunks, with copy_file_range
+where possible. Erased and zeroed blocks are left as holes in the image.
+"""
+
+import errno
+import logging
+import os
+
+BLOCK_SIZE = 4096
+
+# Size of chunks read from new data and written to the image
+COPY_CHUNK_SIZE = 4 * 1024 * 1024
+
+TRANSFER_LIST_VERSIONS = {
+    1: "Android Lollipop 5.0",
+    2: "Android Lollipop 5.1",
+    3: "Android Marshmallow 6.x",
+    4: "Android Nougat 7.x or later",
+}
+
+SUPPORTED_COMMANDS = ("erase", "new", "zero")
+
+
+class BlockImageError(Exception):
+    pass
+
+
+def parse_rangeset(text):
+    """
+    Parse rangeset "<count>,<start>,<end>,..." into (start, end) block ranges
+    """
+    try:
+        numbers = [int(n) for n in text.split(",")]
+    except ValueError:
+        raise BlockImageError("Invalid rangeset %s" % text)
+    if not numbers or len(numbers) != numbers[0] + 1 or numbers[0] % 2:
+        raise BlockImageError("Invalid rangeset %s" % text)
+    return [(numbers[i], numbers[i + 1]) for i in range(1, len(numbers), 2)]
+
+
+def merge_ranges(ranges):
+    """
+    Merge consecutive ranges where one ends at the start of the next.
+    Order is kept, new data is laid out in the order of its ranges.
+    """
+    merged = []
+    for start, end in ranges:
+        if merged and merged[-1][1] == start:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class TransferList(object):
+    """
+    Parsed transfer list
+    Args:
+        path : path to <name>.transfer.list
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.commands = []
+        with open(path, "r") as f:
+            # Version, then total number of blocks written
+            self.version = int(f.readline())
+            self.new_blocks = int(f.readline())
+            if self.version >= 2:
+                # Stash entries and blocks needed simultaneously
+                f.readline()
+                f.readline()
+            for line in f:
+                fields = line.split()
+                if not fields or fields[0][0].isdigit():
+                    continue
+                if fields[0] not in SUPPORTED_COMMANDS:
+                    raise BlockImageError(
+                        "Command %s in %s is not supported, "
+                        "only full OTAs can be converted" % (fields[0], path)
+                    )
+                self.commands.append((fields[0], parse_rangeset(fields[1])))
+
+    @property
+    def android_version(self):
+        return TRANSFER_LIST_VERSIONS.get(self.version, "Unknown Android version")
+
+    @property
+    def size(self):
+        """
+        Size of the image in bytes, up to the last block of any command
+        """
+        blocks = [end for _, ranges in self.commands for _, end in ranges]
+        return max(blocks, default=0) * BLOCK_SIZE
+
+
+def file_chunks(path, chunk_size=COPY_CHUNK_SIZE):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def brotli_chunks(path, chunk_size=COPY_CHUNK_SIZE):
+    """
+    Decompressed data of a brotli compressed file, read in chunks
+    """
+    # Lazy import, brotli is only needed for .new.dat.br
+    try:
+        import brotli
+    except ImportError:
+        raise BlockImageError("brotli is required for %s but not installed" % path)
+    decompressor = brotli.Decompressor()
+    for chunk in file_chunks(path, chunk_size):
+        data = decompressor.process(chunk)
+        if data:
+            yield data
+    if not decompressor.is_finished():
+        raise BlockImageError("Truncated brotli stream in %s" % path)
+
+
+class ChunkCopier(object):
+    """
+    Copies data, given as an iterable of chunks, to ranges of fd
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.chunk = memoryview(b"")
+
+    def copy(self, fd, offset, length):
+        while length > 0:
+            if not self.chunk:
+                self.chunk = memoryview(next(self.chunks, b""))
+                if not self.chunk:
+                    raise BlockImageError("New data ends before its last range")
+            piece = self.chunk[:length]
+            written = 0
+            while written < len(piece):
+                written += os.pwrite(fd, piece[written:], offset + written)
+            self.chunk = self.chunk[len(piece) :]
+            offset += len(piece)
+            length -= len(piece)
+
+    def remaining(self):
+        return len(self.chunk) + sum(len(c) for c in self.chunks)
+
+
+class FileCopier(object):
+    """
+    Copies data of an uncompressed file, read sequentially, to ranges of fd.
+    Uses copy_file_range, so data is copied (or reflinked) in the kernel,
+    falling back to reads and writes where it is not supported.
+    """
+
+    def __init__(self, path):
+        self.src_fd = os.open(path, os.O_RDONLY)
+        self.pos = 0
+        self.kernel_copy = hasattr(os, "copy_file_range")
+
+    def _copy_file_range(self, fd, offset, length):
+        try:
+            return os.copy_file_range(
+                self.src_fd, fd, length, offset_src=self.pos, offset_dst=offset
+            )
+        except OSError as e:
+            if e.errno not in (
+                errno.EXDEV,
+                errno.ENOSYS,
+                errno.EINVAL,
+                errno.EOPNOTSUPP,
+            ):
+                raise
+            logging.debug("copy_file_range not supported (%s), copying data" % e)
+            self.kernel_copy = False
+            return None
+
+    def copy(self, fd, offset, length):
+        while length > 0:
+            copied = None
+            if self.kernel_copy:
+                copied = self._copy_file_range(fd, offset, min(length, 1 << 30))
+            if copied is None:
+                data = os.pread(self.src_fd, min(length, COPY_CHUNK_SIZE), self.pos)
+                copied = len(data)
+                written = 0
+                while written < copied:
+                    written += os.pwrite(fd, data[written:], offset + written)
+            if copied == 0:
+                raise BlockImageError("New data ends before its last range")
+            self.pos += copied
+            offset += copied
+            length -= copied
+
+    def remaining(self):
+        return os.fstat(self.src_fd).st_size - self.pos
+
+    def close(self):
+        os.close(self.src_fd)
+
+
+def overlapping(ranges, start, end):
+    """
+    Parts of (start, end) covered by ranges
+    """
+    for r_start, r_end in ranges:
+        if r_start < end and start < r_end:
+            yield max(r_start, start), min(r_end, end)
+
+
+def write_zeros(fd, offset, length):
+    zeros = bytes(min(length, COPY_CHUNK_SIZE))
+    while length > 0:
+        written = os.pwrite(fd, zeros[:length], offset)
+        offset += written
+        length -= written
+
+
+def sdat2img(transfer_list, new_data, output):
+    """
+    Convert a block based OTA partition to an image.
+    Args:
+        transfer_list : path to <name>.transfer.list
+        new_data : path to <name>.new.dat, or brotli compressed <name>.new.dat.br
+        output : path to image to write. An existing file is replaced.
+    Returns number of bytes of new data copied
+    """
+    transfers = TransferList(transfer_list)
+    logging.debug(
+        "%s: transfer list version %d (%s)"
+        % (transfer_list, transfers.version, transfers.android_version)
+    )
+    if str(new_data).endswith(".br"):
+        copier = ChunkCopier(brotli_chunks(new_data))
+    else:
+        copier = FileCopier(new_data)
+
+    if os.path.lexists(output):
+        os.unlink(output)
+    copied = 0
+    written = []
+    try:
+        with open(output, "wb") as out_f:
+            # Blocks which are never written stay holes
+            out_f.truncate(transfers.size)
+            fd = out_f.fileno()
+            for command, ranges in transfers.commands:
+                if command == "new":
+                    for start, end in merge_ranges(ranges):
+                        copier.copy(fd, start * BLOCK_SIZE, (end - start) * BLOCK_SIZE)
+                        copied += (end - start) * BLOCK_SIZE
+                        written.append((start, end))
+                    continue
+                # erase and zero: only blocks written before need zeroing
+                for start, end in ranges:
+                    for z_start, z_end in overlapping(written, start, end):
+                        write_zeros(
+                            fd, z_start * BLOCK_SIZE, (z_end - z_start) * BLOCK_SIZE
+                        )
+        left = copier.remaining()
+        if left:
+            logging.warning("%d bytes of %s were not used" % (left, new_data))
+    finally:
+        if isinstance(copier, FileCopier):
+            copier.close()
+    return copied
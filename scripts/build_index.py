@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Local index of LineageOS builds of each device, scraped from
+https://download.lineageos.org/<device>.
+
+The index is a JSON file, shared by all devices:
+    {"version": 1, "devices": {"<device>": {"etag": ..., "last_modified": ...,
+     "checked": <unix time>, "builds": [{"type", "version", "url", "size",
+     "date", "sha256"}, ...]}}}
+
+Pages are refreshed with conditional requests (If-None-Match and
+If-Modified-Since), so an unchanged page costs a 304 response. Changed
+pages are parsed as they are downloaded, and only up to the end of the
+builds table. Builds are listed newest first, as on the page.
+
+Configured with environment variables:
+    LOS_INDEX_FILE : index file (default: builds.json in the cache directory)
+"""
+
+import logging
+import time
+from html.parser import HTMLParser
+
+from json_store import JsonStore
+
+DOWNLOAD_PAGE_URL = "https://download.lineageos.org/{device}"
+
+INDEX_VERSION = 1
+INDEX_FILE_NAME = "builds.json"
+
+HTTP_TIMEOUT = 10
+PAGE_CHUNK_SIZE = 16 * 1024
+
+# Cells of a build row: type, version, download link, size, ..., date
+BUILD_ROW_CELLS = 7
+
+
+class BuildIndexError(Exception):
+    pass
+
+
+class BuildTableParser(HTMLParser):
+    """
+    Collects builds from rows of the first table of a download page.
+    done is set once the table has ended, the rest of the page
+    does not need to be read.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.builds = []
+        self.done = False
+        self._in_table = False
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == "table":
+            self._in_table = True
+        elif not self._in_table:
+            return
+        elif tag == "tr":
+            self._row = []
+        elif tag == "td" and self._row is not None:
+            self._cell = {"text": [], "href": None}
+        elif tag == "a" and self._cell is not None:
+            self._cell["href"] = self._cell["href"] or dict(attrs).get("href")
+
+    def handle_endtag(self, tag):
+        if self.done or not self._in_table:
+            return
+        if tag == "td" and self._cell is not None:
+            self._row.append(self._cell)
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            # Header rows use th, not td
+            if len(self._row) == BUILD_ROW_CELLS:
+                self.builds.append(self._build(self._row))
+            self._row = None
+        elif tag == "table":
+            self.done = True
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell["text"].append(data)
+
+    @staticmethod
+    def _build(row):
+        text = ["".join(cell["text"]).strip() for cell in row]
+        return {
+            "type": text[0],
+            "version": text[1],
+            "url": row[2]["href"],
+            "size": text[3],
+            "date": text[6],
+            "sha256": None,
+        }
+
+
+def parse_download_page(chunks):
+    """
+    Builds listed on a download page, given as chunks of text.
+    Stops reading chunks once the builds table has ended.
+    """
+    parser = BuildTableParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        if parser.done:
+            break
+    parser.close()
+    return parser.builds
+
+
+def release_tag(build):
+    """
+    Tag of a build, <version>.<date>
+    """
+    return f"{build['version']}.{build['date']}"
+
+
+class BuildIndex(JsonStore):
+    """
+    Args:
+        path : path to index file
+    """
+
+    VERSION = INDEX_VERSION
+    DESCRIPTION = "build index"
+    ENVIRONMENT = "LOS_INDEX_FILE"
+    FILE_NAME = INDEX_FILE_NAME
+
+    def entry(self, device):
+        """
+        Index entry of device, None if it was never fetched
+        """
+        return self._load()["devices"].get(device)
+
+    def builds(self, device):
+        """
+        Indexed builds of device, newest first, without refreshing them
+        """
+        entry = self.entry(device)
+        return entry["builds"] if entry else []
+
+    def refresh(self, device, max_age=0):
+        """
+        Refresh builds of device from its download page, unless they were
+        checked less than max_age seconds ago.
+        Returns builds of device, newest first
+        """
+        entry = self.entry(device)
+        if entry and time.time() - entry["checked"] < max_age:
+            logging.debug("Build index of %s is recent, not refreshing it", device)
+            return entry["builds"]
+
+        # Lazy import, requests is only needed when refreshing
+        import requests
+
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        url = DOWNLOAD_PAGE_URL.format(device=device)
+        logging.debug("Fetching download page %s", url)
+        with requests.get(
+            url, headers=headers, stream=True, timeout=HTTP_TIMEOUT
+        ) as response:
+            logging.debug("Response code is %s", response.status_code)
+            if response.status_code == 304:
+                logging.info("Download page of %s is unchanged", device)
+                builds = None
+            else:
+                response.raise_for_status()
+                response.encoding = response.encoding or "utf-8"
+                builds = parse_download_page(
+                    response.iter_content(
+                        chunk_size=PAGE_CHUNK_SIZE, decode_unicode=True
+                    )
+                )
+                if not builds:
+                    raise BuildIndexError(f"No builds found on {url}")
+                logging.info("Indexed %d builds of %s", len(builds), device)
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+
+        with self._locked():
+            data = self._load()
+            old = data["devices"].get(device) or {"builds": []}
+            if builds is None:
+                # Entry may have been dropped since (e.g. index reset)
+                if not old["builds"]:
+                    raise BuildIndexError(
+                        f"{url} is unchanged, but no builds of {device} are indexed"
+                    )
+                builds = old["builds"]
+            else:
+                # Keep checksums of builds which are still listed
+                checksums = {b["url"]: b.get("sha256") for b in old["builds"]}
+                for build in builds:
+                    build["sha256"] = checksums.get(build["url"])
+            data["devices"][device] = {
+                "etag": etag or old.get("etag"),
+                "last_modified": last_modified or old.get("last_modified"),
+                "checked": time.time(),
+                "builds": builds,
+            }
+            self._save(data)
+        return builds
+
+    def set_sha256(self, device, url, sha256):
+        """
+        Record SHA-256 of build of device at url
+        """
+        with self._locked():
+            data = self._load()
+            entry = data["devices"].get(device)
+            for build in entry["builds"] if entry else []:
+                if build["url"] == url:
+                    build["sha256"] = sha256
+            self._save(data)
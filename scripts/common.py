@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+Setup and helpers shared by scripts
+"""
+
+import logging
+from pathlib import Path
+
+from metrics import log_level
+
+LOG_FORMAT = "%(asctime)s %(programname)15s %(levelname)8s  %(lineno)3d  %(message)s"
+
+
+def setup_logging():
+    """
+    Log in color, at the level set by LOS_LOG_LEVEL.
+    Scripts call this when loaded, again for each command run by los.
+    """
+    # Lazy import, so that importing this module stays cheap
+    import coloredlogs
+
+    field_styles = dict(coloredlogs.DEFAULT_FIELD_STYLES)
+    field_styles["programname"] = {"color": "magenta"}
+    coloredlogs.install(level=log_level(), fmt=LOG_FORMAT, field_styles=field_styles)
+
+
+def purge(dir, pattern):
+    """
+    Delete files in specified dir by pattern
+    Args:
+        dir : directory to scan
+        pattern : regex to match
+    """
+    for p in Path(dir).glob(pattern):
+        logging.debug(f"Deleting - {p}")
+        p.unlink()
@@ -0,0 +1,608 @@
+# -*- coding: utf-8 -*-
+"""
+Read-only access to files in ext4 and EROFS filesystem images,
+without mounting them.
+
+Only what is needed to copy files out of Android partition images is
+implemented: path lookup (following symlinks) and reading regular files.
+Compressed EROFS files are not supported.
+"""
+
+import errno
+import itertools
+import logging
+import os
+import shutil
+import stat
+import struct
+
+SUPERBLOCK_OFFSET = 1024
+
+# Size of chunks read from image and written to destination
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Maximum number of symlinks followed while resolving a path
+MAX_SYMLINKS = 40
+
+EXT4_MAGIC = 0xEF53
+EXT4_INCOMPAT_64BIT = 0x80
+EXT4_EXTENTS_FL = 0x80000
+EXT4_INLINE_DATA_FL = 0x10000000
+EXT4_EXTENT_MAGIC = 0xF30A
+# Extents longer than this are uninitialized (read as zeros)
+EXT4_EXTENT_INIT_MAX = 32768
+EXT4_N_BLOCKS = 15
+EXT4_I_BLOCK_OFFSET = 0x28
+EXT4_I_BLOCK_SIZE = 60
+
+EROFS_MAGIC = 0xE0F5E1E2
+EROFS_SLOT_SIZE = 32
+EROFS_INODE_FLAT_PLAIN = 0
+EROFS_INODE_FLAT_INLINE = 2
+EROFS_INODE_CHUNK_BASED = 4
+EROFS_CHUNK_FORMAT_BLKBITS_MASK = 0x1F
+EROFS_CHUNK_FORMAT_INDEXES = 0x20
+EROFS_NULL_ADDR = 0xFFFFFFFF
+
+
+class FilesystemError(Exception):
+    pass
+
+
+class ImageFile(object):
+    """
+    Filesystem image stored in a file
+    Args:
+        path : path to image file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+
+    def read_at(self, offset, length):
+        """
+        Read exactly length bytes at offset
+        """
+        data = os.pread(self.fd, length, offset)
+        while len(data) < length:
+            more = os.pread(self.fd, length - len(data), offset + len(data))
+            if not more:
+                raise FilesystemError(
+                    "Read past end of image at %d (+%d)" % (offset, length)
+                )
+            data += more
+        return data
+
+    def copy_range(self, offset, length, fd, dest_offset):
+        """
+        Copy length bytes at offset to fd at dest_offset
+        """
+        copy_file_range(self.fd, offset, length, fd, dest_offset)
+
+    def close(self):
+        os.close(self.fd)
+
+
+# copy_file_range errors meaning it cannot be used for a pair of files
+COPY_FILE_RANGE_UNSUPPORTED = (
+    errno.EXDEV,
+    errno.ENOSYS,
+    errno.EINVAL,
+    errno.EOPNOTSUPP,
+)
+
+
+def copy_file_range(src_fd, offset, length, fd, dest_offset):
+    """
+    Copy length bytes at offset of src_fd to fd at dest_offset.
+    Data is copied in the kernel with copy_file_range, which reflinks
+    it on filesystems supporting that (btrfs, XFS), falling back to
+    reading and writing it.
+    """
+    while length > 0:
+        try:
+            copied = os.copy_file_range(
+                src_fd, fd, length, offset_src=offset, offset_dst=dest_offset
+            )
+        except (AttributeError, OSError) as e:
+            if getattr(e, "errno", errno.ENOSYS) not in COPY_FILE_RANGE_UNSUPPORTED:
+                raise
+            data = os.pread(src_fd, min(length, COPY_CHUNK_SIZE), offset)
+            copied = os.pwrite(fd, data, dest_offset) if data else 0
+        if copied == 0:
+            raise FilesystemError(
+                "Read past end of file at %d (+%d)" % (offset, length)
+            )
+        offset += copied
+        dest_offset += copied
+        length -= copied
+
+
+def copy_file(src, dest, hasher=None):
+    """
+    Copy file src of the host filesystem to dest like shutil.copy2,
+    using copy_file_range.
+    Args:
+        hasher : hashlib object updated with contents of the file
+    """
+    src_fd = os.open(src, os.O_RDONLY)
+    try:
+        size = os.fstat(src_fd).st_size
+        with open(dest, "wb") as dest_f:
+            for offset in range(0, size, COPY_CHUNK_SIZE):
+                n = min(COPY_CHUNK_SIZE, size - offset)
+                if hasher is not None:
+                    hasher.update(os.pread(src_fd, n, offset))
+                copy_file_range(src_fd, offset, n, dest_f.fileno(), offset)
+    finally:
+        os.close(src_fd)
+    shutil.copystat(src, dest)
+
+
+class Inode(object):
+    """
+    Inode of a filesystem image.
+    extents is a list of (file offset, length, device offset) tuples in
+    file order, device offset being None for ranges reading as zeros.
+    Ranges of the file not covered by any extent read as zeros.
+    """
+
+    def __init__(self, number, mode, size, mtime, extents):
+        self.number = number
+        self.mode = mode
+        self.size = size
+        self.mtime = mtime
+        self.extents = extents
+
+    def is_dir(self):
+        return stat.S_ISDIR(self.mode)
+
+    def is_file(self):
+        return stat.S_ISREG(self.mode)
+
+    def is_symlink(self):
+        return stat.S_ISLNK(self.mode)
+
+
+class Filesystem(object):
+    """
+    Base class of filesystem readers.
+    Subclasses implement inode() and listdir() and set root_inode.
+    Args:
+        device : object with read_at(offset, length), like ImageFile
+    """
+
+    name = None
+    root_inode = None
+
+    def __init__(self, device):
+        self.device = device
+
+    def inode(self, number):
+        raise NotImplementedError
+
+    def listdir(self, inode):
+        """
+        Entries of directory inode as a dict of name to inode number
+        """
+        raise NotImplementedError
+
+    def iter_chunks(self, inode, chunk_size=COPY_CHUNK_SIZE):
+        """
+        Chunks of contents of inode, of at most chunk_size bytes,
+        as (file offset, length, device offset) tuples.
+        Device offset is None for chunks reading as zeros.
+        """
+        pos = 0
+        for file_offset, length, device_offset in inode.extents:
+            end = min(file_offset + length, inode.size)
+            while pos < end:
+                if pos < file_offset:
+                    n = min(chunk_size, file_offset - pos)
+                    yield pos, n, None
+                else:
+                    n = min(chunk_size, end - pos)
+                    if device_offset is None:
+                        yield pos, n, None
+                    else:
+                        yield pos, n, device_offset + pos - file_offset
+                pos += n
+        while pos < inode.size:
+            n = min(chunk_size, inode.size - pos)
+            yield pos, n, None
+            pos += n
+
+    def iter_file(self, inode, chunk_size=COPY_CHUNK_SIZE):
+        """
+        Read contents of inode in chunks of at most chunk_size bytes
+        """
+        for _, n, device_offset in self.iter_chunks(inode, chunk_size):
+            if device_offset is None:
+                yield bytes(n)
+            else:
+                yield self.device.read_at(device_offset, n)
+
+    def read_file(self, inode):
+        return b"".join(self.iter_file(inode))
+
+    def lookup(self, path):
+        """
+        Inode of path (relative to root of filesystem), following symlinks
+        """
+        parts = [p for p in path.split("/") if p not in ("", ".")]
+        inode = self.inode(self.root_inode)
+        dirs = [inode]
+        links = 0
+        while parts:
+            name = parts.pop(0)
+            if not inode.is_dir():
+                raise NotADirectoryError(path)
+            if name == "..":
+                if len(dirs) > 1:
+                    dirs.pop()
+                inode = dirs[-1]
+                continue
+            entries = self.listdir(inode)
+            if name not in entries:
+                raise FileNotFoundError(path)
+            child = self.inode(entries[name])
+            if child.is_symlink():
+                links += 1
+                if links > MAX_SYMLINKS:
+                    raise FilesystemError("Too many levels of symlinks: %s" % path)
+                target = self.read_file(child).decode("utf-8")
+                if target.startswith("/"):
+                    dirs = dirs[:1]
+                parts = [p for p in target.split("/") if p not in ("", ".")] + parts
+                inode = dirs[-1]
+                continue
+            inode = child
+            dirs.append(inode)
+        return inode
+
+    def copy(self, path, dest, hasher=None):
+        """
+        Copy regular file path from image to dest, preserving
+        permissions and modification time like shutil.copy2.
+        Data is copied with device.copy_range if the device has it,
+        e.g. with copy_file_range from an image file.
+        Zero ranges are left as holes.
+        Args:
+            hasher : hashlib object updated with contents of the file
+        """
+        inode = self.lookup(path)
+        if not inode.is_file():
+            raise FilesystemError("%s is not a regular file" % path)
+        copy_range = getattr(self.device, "copy_range", None)
+        with open(dest, "wb") as dest_f:
+            fd = dest_f.fileno()
+            for pos, n, device_offset in self.iter_chunks(inode):
+                if device_offset is None:
+                    if hasher is not None:
+                        hasher.update(bytes(n))
+                    continue
+                if copy_range is not None and hasher is None:
+                    copy_range(device_offset, n, fd, pos)
+                    continue
+                data = self.device.read_at(device_offset, n)
+                if hasher is not None:
+                    hasher.update(data)
+                if copy_range is not None:
+                    # Data was just read, copying it again comes from
+                    # page cache, and may be a reflink
+                    copy_range(device_offset, n, fd, pos)
+                else:
+                    os.pwrite(fd, data, pos)
+            dest_f.truncate(inode.size)
+        os.chmod(dest, stat.S_IMODE(inode.mode))
+        os.utime(dest, (inode.mtime, inode.mtime))
+
+    def close(self):
+        close = getattr(self.device, "close", None)
+        if close is not None:
+            close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Ext4(Filesystem):
+    """
+    ext4 (and ext2/ext3) filesystem reader
+    """
+
+    name = "ext4"
+    root_inode = 2
+
+    def __init__(self, device):
+        super().__init__(device)
+        sb = self.device.read_at(SUPERBLOCK_OFFSET, 1024)
+        (magic,) = struct.unpack_from("<H", sb, 0x38)
+        if magic != EXT4_MAGIC:
+            raise FilesystemError("Not an ext4 filesystem")
+        self.block_size = 1024 << struct.unpack_from("<I", sb, 0x18)[0]
+        self.first_data_block = struct.unpack_from("<I", sb, 0x14)[0]
+        self.inodes_per_group = struct.unpack_from("<I", sb, 0x28)[0]
+        rev_level = struct.unpack_from("<I", sb, 0x4C)[0]
+        self.inode_size = struct.unpack_from("<H", sb, 0x58)[0] if rev_level else 128
+        incompat = struct.unpack_from("<I", sb, 0x60)[0]
+        self.desc_size = 32
+        if incompat & EXT4_INCOMPAT_64BIT:
+            self.desc_size = struct.unpack_from("<H", sb, 0xFE)[0]
+        self._inode_tables = {}
+
+    def _inode_table(self, group):
+        if group not in self._inode_tables:
+            offset = (self.first_data_block + 1) * self.block_size
+            desc = self.device.read_at(offset + group * self.desc_size, self.desc_size)
+            table = struct.unpack_from("<I", desc, 0x08)[0]
+            if self.desc_size >= 64:
+                table |= struct.unpack_from("<I", desc, 0x28)[0] << 32
+            self._inode_tables[group] = table
+        return self._inode_tables[group]
+
+    def _block_extents(self, blocks):
+        """
+        Merge (logical block, physical block or None) pairs into extents
+        """
+        extents = []
+        bs = self.block_size
+        for logical, physical in blocks:
+            if extents:
+                file_offset, length, device_offset = extents[-1]
+                if file_offset + length == logical * bs and (
+                    (device_offset is None and physical is None)
+                    or (
+                        device_offset is not None
+                        and physical is not None
+                        and device_offset + length == physical * bs
+                    )
+                ):
+                    extents[-1] = (file_offset, length + bs, device_offset)
+                    continue
+            extents.append(
+                (logical * bs, bs, None if physical is None else physical * bs)
+            )
+        return extents
+
+    def _extent_tree(self, node):
+        """
+        Walk extent tree node, yielding (logical block, length, physical block)
+        (physical block is None for uninitialized extents)
+        """
+        magic, entries, _, depth = struct.unpack_from("<HHHH", node, 0)
+        if magic != EXT4_EXTENT_MAGIC:
+            raise FilesystemError("Bad extent header magic")
+        for i in range(entries):
+            entry = 12 + i * 12
+            if depth == 0:
+                logical, length, start_hi, start_lo = struct.unpack_from(
+                    "<IHHI", node, entry
+                )
+                physical = (start_hi << 32) | start_lo
+                if length > EXT4_EXTENT_INIT_MAX:
+                    length -= EXT4_EXTENT_INIT_MAX
+                    physical = None
+                yield logical, length, physical
+            else:
+                _, leaf_lo, leaf_hi = struct.unpack_from("<IIH", node, entry)
+                leaf = (leaf_hi << 32) | leaf_lo
+                child = self.device.read_at(leaf * self.block_size, self.block_size)
+                yield from self._extent_tree(child)
+
+    def _indirect(self, block, level, limit):
+        """
+        Physical blocks (None for holes) referenced by an indirect block
+        of given level, at most limit of them
+        """
+        count = self.block_size // 4
+        if block == 0:
+            # Hole of all blocks the indirect block would have mapped
+            yield from itertools.repeat(None, min(count**level, limit))
+            return
+        data = self.device.read_at(block * self.block_size, self.block_size)
+        for physical in struct.unpack("<%dI" % count, data):
+            if limit <= 0:
+                return
+            if level == 1:
+                yield physical or None
+                limit -= 1
+            else:
+                span = min(count ** (level - 1), limit)
+                yield from self._indirect(physical, level - 1, span)
+                limit -= span
+
+    def _block_map(self, i_block, size):
+        """
+        (logical block, physical block or None) pairs of a block mapped inode
+        """
+        nblocks = -(-size // self.block_size)
+        pointers = struct.unpack_from("<%dI" % EXT4_N_BLOCKS, i_block, 0)
+        physical_blocks = [physical or None for physical in pointers[:12]]
+        for level, block in enumerate(pointers[12:], start=1):
+            remaining = nblocks - len(physical_blocks)
+            if remaining <= 0:
+                break
+            physical_blocks += self._indirect(block, level, remaining)
+        for logical, physical in enumerate(physical_blocks[:nblocks]):
+            yield logical, physical
+
+    def inode(self, number):
+        group, index = divmod(number - 1, self.inodes_per_group)
+        offset = self._inode_table(group) * self.block_size + index * self.inode_size
+        raw = self.device.read_at(offset, self.inode_size)
+        mode, _, size_lo, _, _, mtime = struct.unpack_from("<HHIIII", raw, 0)
+        (flags,) = struct.unpack_from("<I", raw, 0x20)
+        (size_hi,) = struct.unpack_from("<I", raw, 0x6C)
+        size = (size_hi << 32) | size_lo
+        i_block = raw[EXT4_I_BLOCK_OFFSET : EXT4_I_BLOCK_OFFSET + EXT4_I_BLOCK_SIZE]
+        i_block_offset = offset + EXT4_I_BLOCK_OFFSET
+
+        if flags & EXT4_INLINE_DATA_FL or (
+            stat.S_ISLNK(mode) and size < EXT4_I_BLOCK_SIZE and not flags & EXT4_EXTENTS_FL
+        ):
+            if size > EXT4_I_BLOCK_SIZE:
+                raise FilesystemError(
+                    "Inline data larger than i_block is not supported (inode %d)"
+                    % number
+                )
+            extents = [(0, size, i_block_offset)]
+        elif flags & EXT4_EXTENTS_FL:
+            extents = [
+                (
+                    logical * self.block_size,
+                    length * self.block_size,
+                    None if physical is None else physical * self.block_size,
+                )
+                for logical, length, physical in self._extent_tree(i_block)
+            ]
+            extents.sort()
+        else:
+            extents = self._block_extents(self._block_map(i_block, size))
+        inode = Inode(number, mode, size, mtime, extents)
+        inode.inline = bool(flags & EXT4_INLINE_DATA_FL)
+        return inode
+
+    def listdir(self, inode):
+        data = self.read_file(inode)
+        entries = {}
+        pos = 0
+        if inode.inline:
+            # Inline directories start with the parent inode number
+            entries[".."] = struct.unpack_from("<I", data, 0)[0]
+            pos = 4
+        while pos + 8 <= len(data):
+            number, rec_len, name_len = struct.unpack_from("<IHB", data, pos)
+            if rec_len < 8:
+                break
+            if number:
+                entries[data[pos + 8 : pos + 8 + name_len].decode("utf-8")] = number
+            pos += rec_len
+        return entries
+
+
+class Erofs(Filesystem):
+    """
+    EROFS filesystem reader (uncompressed and chunk based files only)
+    """
+
+    name = "erofs"
+
+    def __init__(self, device):
+        super().__init__(device)
+        sb = self.device.read_at(SUPERBLOCK_OFFSET, 128)
+        (magic,) = struct.unpack_from("<I", sb, 0)
+        if magic != EROFS_MAGIC:
+            raise FilesystemError("Not an EROFS filesystem")
+        self.block_size = 1 << sb[0x0C]
+        (self.root_inode,) = struct.unpack_from("<H", sb, 0x0E)
+        (self.build_time,) = struct.unpack_from("<Q", sb, 0x18)
+        (self.meta_blkaddr,) = struct.unpack_from("<I", sb, 0x28)
+
+    def _chunk_extents(self, number, chunk_format, size, indexes_offset):
+        if chunk_format & EROFS_CHUNK_FORMAT_INDEXES:
+            entry_size = 8
+            indexes_offset = (indexes_offset + 7) & ~7
+        else:
+            entry_size = 4
+        chunk_size = self.block_size << (chunk_format & EROFS_CHUNK_FORMAT_BLKBITS_MASK)
+        count = -(-size // chunk_size)
+        raw = self.device.read_at(indexes_offset, count * entry_size)
+        extents = []
+        for i in range(count):
+            if entry_size == 8:
+                _, device_id, blkaddr = struct.unpack_from("<HHI", raw, i * 8)
+                if device_id:
+                    raise FilesystemError(
+                        "Multi-device EROFS is not supported (inode %d)" % number
+                    )
+            else:
+                (blkaddr,) = struct.unpack_from("<I", raw, i * 4)
+            if blkaddr != EROFS_NULL_ADDR:
+                extents.append((i * chunk_size, chunk_size, blkaddr * self.block_size))
+        return extents
+
+    def inode(self, number):
+        offset = self.meta_blkaddr * self.block_size + number * EROFS_SLOT_SIZE
+        raw = self.device.read_at(offset, 64)
+        i_format, xattr_icount, mode = struct.unpack_from("<HHH", raw, 0)
+        if i_format & 1:
+            inode_size = 64
+            (size,) = struct.unpack_from("<Q", raw, 8)
+            (i_u,) = struct.unpack_from("<I", raw, 16)
+            (mtime,) = struct.unpack_from("<Q", raw, 32)
+        else:
+            inode_size = 32
+            size, _, i_u = struct.unpack_from("<III", raw, 8)
+            mtime = self.build_time
+        xattr_size = 12 + (xattr_icount - 1) * 4 if xattr_icount else 0
+        inline_offset = offset + inode_size + xattr_size
+        layout = (i_format >> 1) & 0x7
+
+        if layout == EROFS_INODE_FLAT_PLAIN:
+            extents = [(0, size, i_u * self.block_size)]
+        elif layout == EROFS_INODE_FLAT_INLINE:
+            full = size - size % self.block_size
+            extents = []
+            if full:
+                extents.append((0, full, i_u * self.block_size))
+            if size > full:
+                extents.append((full, size - full, inline_offset))
+        elif layout == EROFS_INODE_CHUNK_BASED:
+            extents = self._chunk_extents(number, i_u, size, inline_offset)
+        else:
+            raise FilesystemError(
+                "Compressed EROFS files are not supported (inode %d)" % number
+            )
+        return Inode(number, mode, size, mtime, extents)
+
+    def listdir(self, inode):
+        data = self.read_file(inode)
+        entries = {}
+        for block_start in range(0, len(data), self.block_size):
+            block = data[block_start : block_start + self.block_size]
+            count = struct.unpack_from("<H", block, 8)[0] // 12
+            for i in range(count):
+                number, name_offset = struct.unpack_from("<QH", block, i * 12)
+                if i + 1 < count:
+                    name_end = struct.unpack_from("<H", block, (i + 1) * 12 + 8)[0]
+                    name = block[name_offset:name_end]
+                else:
+                    name = block[name_offset:].split(b"\0", 1)[0]
+                entries[name.decode("utf-8")] = number
+        return entries
+
+
+FILESYSTEMS = [Ext4, Erofs]
+
+
+def open_image(path):
+    """
+    Open filesystem image at path, detecting its type
+    Returns a Filesystem
+    """
+    device = ImageFile(path)
+    return open_device(device)
+
+
+def open_device(device):
+    """
+    Open filesystem on device (object with read_at(offset, length)),
+    detecting its type
+    Returns a Filesystem
+    """
+    for filesystem in FILESYSTEMS:
+        try:
+            fs = filesystem(device)
+        except FilesystemError:
+            continue
+        logging.debug("Detected %s filesystem" % fs.name)
+        return fs
+    close = getattr(device, "close", None)
+    if close is not None:
+        close()
+    raise FilesystemError("Unknown or unsupported filesystem")
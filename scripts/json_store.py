@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+JSON file of per device state, shared by builds of all devices:
+    {"version": <VERSION>, "devices": {"<device>": ...}}
+
+Updates are made under an exclusive lock (<file>.lock), as builds of
+several devices may update it concurrently. Files are replaced
+atomically, readers never see a partial file.
+"""
+
+import contextlib
+import fcntl
+import json
+import logging
+import os
+from pathlib import Path
+
+from artifact_cache import DEFAULT_CACHE_DIR
+
+
+class JsonStore(object):
+    """
+    Base of per device JSON files, see BuildIndex and ReleaseState.
+    Subclasses set VERSION, DESCRIPTION (used in log messages),
+    ENVIRONMENT (variable naming the file) and FILE_NAME (name of the
+    file in the cache directory, if the variable is not set).
+    Args:
+        path : path to file
+    """
+
+    VERSION = 1
+    DESCRIPTION = "state"
+    ENVIRONMENT = None
+    FILE_NAME = None
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    @classmethod
+    def from_environment(cls):
+        path = os.environ.get(cls.ENVIRONMENT)
+        if not path:
+            cache_dir = os.environ.get("LOS_CACHE_DIR") or DEFAULT_CACHE_DIR
+            path = Path(cache_dir) / cls.FILE_NAME
+        return cls(path)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """
+        Exclusive lock of the file, held while reading, updating and
+        writing it
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(f"{self.path}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = None
+        except ValueError:
+            logging.warning("Ignoring invalid %s - %s", self.DESCRIPTION, self.path)
+            data = None
+        if not data or data.get("version") != self.VERSION:
+            data = {"version": self.VERSION, "devices": {}}
+        return data
+
+    def _save(self, data):
+        tmp_file = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_file, "w+") as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp_file, self.path)
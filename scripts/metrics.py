@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+Run reports of scripts: wall time, bytes read and written and peak RSS
+of each stage, and count, time and data sizes of payload operations by
+type (giving operations per second and decompression ratio).
+
+Reports are written when the script exits, as JSON (<name>.json) and
+as a Prometheus textfile (<name>.prom, for the node exporter textfile
+collector), if a directory is configured. name is the name of the script
+followed by values of its labels, e.g. unpack-payload-coral, so that runs
+with different labels can share a directory.
+
+Configured with environment variables:
+    LOS_METRICS_DIR : directory to write reports to (default: no reports)
+    LOS_METRICS_LABELS : labels added to all metrics, e.g. device=coral
+    LOS_LOG_LEVEL : log level of scripts (default: DEBUG). Per operation
+                    debug logging is skipped unless it is DEBUG.
+"""
+
+import atexit
+import contextlib
+import json
+import logging
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+
+REPORT_VERSION = 1
+METRIC_PREFIX = "los"
+
+
+def log_level():
+    """
+    Log level of scripts, from LOS_LOG_LEVEL
+    """
+    return os.environ.get("LOS_LOG_LEVEL", "DEBUG").upper()
+
+
+def own_peak_rss():
+    """
+    Peak RSS in KiB of this process. Taken from /proc where possible, as
+    ru_maxrss includes RSS of the parent at the time this program was
+    executed.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def peak_rss():
+    """
+    Peak RSS in bytes of this process and of its (waited for) children,
+    e.g. extraction workers
+    """
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in KiB on Linux
+    return max(own_peak_rss(), children) * 1024
+
+
+class OperationStats(object):
+    """
+    Count, time and data sizes of operations, by operation type.
+    Picklable, so that workers can return theirs to be merged.
+    """
+
+    def __init__(self):
+        # type name -> [count, seconds, data bytes, output bytes]
+        self.types = {}
+
+    def add(self, type_name, seconds, data_bytes, output_bytes):
+        stats = self.types.get(type_name)
+        if stats is None:
+            stats = self.types[type_name] = [0, 0.0, 0, 0]
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] += data_bytes
+        stats[3] += output_bytes
+
+    def merge(self, other):
+        for type_name, values in other.types.items():
+            count, seconds, data_bytes, output_bytes = values
+            stats = self.types.setdefault(type_name, [0, 0.0, 0, 0])
+            stats[0] += count
+            stats[1] += seconds
+            stats[2] += data_bytes
+            stats[3] += output_bytes
+
+    @property
+    def data_bytes(self):
+        return sum(s[2] for s in self.types.values())
+
+    @property
+    def output_bytes(self):
+        return sum(s[3] for s in self.types.values())
+
+    def to_dict(self):
+        return {
+            type_name: {
+                "count": count,
+                "seconds": round(seconds, 6),
+                "per_second": round(count / seconds, 1) if seconds else None,
+                "data_bytes": data_bytes,
+                "output_bytes": output_bytes,
+                "ratio": round(output_bytes / data_bytes, 3) if data_bytes else None,
+            }
+            for type_name, (count, seconds, data_bytes, output_bytes) in sorted(
+                self.types.items()
+            )
+        }
+
+
+class Stage(object):
+    """
+    Numbers of a stage of a script, e.g. extraction of a partition
+    """
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.seconds = 0.0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.peak_rss = 0
+        self.operations = OperationStats()
+
+    def to_dict(self):
+        stage = {
+            "stage": self.name,
+            "labels": self.labels,
+            "seconds": round(self.seconds, 6),
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "peak_rss_bytes": self.peak_rss,
+        }
+        if self.operations.types:
+            stage["operations"] = self.operations.to_dict()
+        return stage
+
+
+def parse_labels(text):
+    """
+    Labels from text like "device=coral,branch=x"
+    """
+    labels = {}
+    for item in filter(None, (i.strip() for i in (text or "").split(","))):
+        key, _, value = item.partition("=")
+        labels[key.strip()] = value.strip()
+    return labels
+
+
+def prometheus_labels(labels):
+    escaped = (
+        '%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in labels.items()
+    )
+    return "{%s}" % ",".join(escaped)
+
+
+class RunReport(object):
+    """
+    Stages of a run of a script
+    Args:
+        script : name of the script
+        directory : directory to write reports to, None to not write any
+        labels : labels added to all stages
+    """
+
+    def __init__(self, script, directory=None, labels=None):
+        self.script = script
+        self.directory = directory
+        self.labels = dict(labels or {})
+        self.stages = []
+        self.start = time.time()
+
+    def add_stage(self, name, **labels):
+        """
+        Add a stage, whose time is set by the caller
+        """
+        stage = Stage(name, {**self.labels, **labels})
+        self.stages.append(stage)
+        return stage
+
+    @contextlib.contextmanager
+    def stage(self, name, **labels):
+        """
+        Time a stage. Yields its Stage, to add bytes and operations to.
+        """
+        stage = self.add_stage(name, **labels)
+        start = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            stage.seconds = time.perf_counter() - start
+            stage.peak_rss = peak_rss()
+
+    def to_dict(self):
+        return {
+            "version": REPORT_VERSION,
+            "script": self.script,
+            "labels": self.labels,
+            "start": self.start,
+            "seconds": round(time.time() - self.start, 6),
+            "peak_rss_bytes": peak_rss(),
+            "stages": [s.to_dict() for s in self.stages],
+        }
+
+    def prometheus(self):
+        """
+        Stages in Prometheus text exposition format
+        """
+        gauges = {
+            "stage_seconds": ("Wall time of stage", lambda s: s.seconds),
+            "stage_read_bytes": ("Bytes read by stage", lambda s: s.bytes_read),
+            "stage_written_bytes": (
+                "Bytes written by stage",
+                lambda s: s.bytes_written,
+            ),
+            "stage_peak_rss_bytes": (
+                "Peak RSS at end of stage",
+                lambda s: s.peak_rss,
+            ),
+        }
+        operation_gauges = {
+            "operations": ("Number of operations", 0),
+            "operation_seconds": ("Time spent applying operations", 1),
+            "operation_data_bytes": ("Payload data of operations", 2),
+            "operation_output_bytes": ("Output of operations", 3),
+        }
+        lines = []
+        for metric, (help, value) in gauges.items():
+            lines.append(f"# HELP {METRIC_PREFIX}_{metric} {help}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{metric} gauge")
+            for s in self.stages:
+                labels = {"script": self.script, "stage": s.name, **s.labels}
+                lines.append(
+                    f"{METRIC_PREFIX}_{metric}{prometheus_labels(labels)} {value(s)}"
+                )
+        for metric, (help, index) in operation_gauges.items():
+            lines.append(f"# HELP {METRIC_PREFIX}_{metric} {help}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{metric} gauge")
+            for s in self.stages:
+                for type_name, stats in sorted(s.operations.types.items()):
+                    labels = {
+                        "script": self.script,
+                        "stage": s.name,
+                        **s.labels,
+                        "type": type_name,
+                    }
+                    lines.append(
+                        f"{METRIC_PREFIX}_{metric}{prometheus_labels(labels)}"
+                        f" {stats[index]}"
+                    )
+        return "\n".join(lines) + "\n"
+
+    @property
+    def name(self):
+        return "-".join([self.script, *(str(v) for v in self.labels.values())])
+
+    def write(self):
+        """
+        Write JSON report and Prometheus textfile, if a directory is set
+        """
+        if self.directory is None:
+            return
+        directory = Path(self.directory)
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            for suffix, text in (
+                ("json", json.dumps(self.to_dict(), indent=4)),
+                ("prom", self.prometheus()),
+            ):
+                path = directory / f"{self.name}.{suffix}"
+                tmp_file = directory / f".{self.name}.{suffix}.{os.getpid()}.tmp"
+                with open(tmp_file, "w+") as f:
+                    f.write(text)
+                os.replace(tmp_file, path)
+        except OSError as e:
+            logging.warning("Failed to write run report to %s - %s", directory, e)
+
+
+# Reports opened by this process, written when it exits
+REPORTS = []
+
+
+def write_reports():
+    """
+    Write reports opened so far, in the order they were opened
+    """
+    while REPORTS:
+        REPORTS.pop(0).write()
+
+
+atexit.register(write_reports)
+
+
+def open_report(script=None):
+    """
+    RunReport of this run of script (default: name of the program),
+    configured by LOS_METRICS_DIR and LOS_METRICS_LABELS.
+    It is written when the script exits, or by write_reports.
+    """
+    report = RunReport(
+        script or Path(sys.argv[0]).name,
+        os.environ.get("LOS_METRICS_DIR") or None,
+        parse_labels(os.environ.get("LOS_METRICS_LABELS")),
+    )
+    REPORTS.append(report)
+    return report
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+# SPDX-License-Identifier: Apache-2.0
+# This file was modified from https://github.com/LineageOS/update_verifier
+"""
+Whole-file signatures of Android update files.
+
+The signature is a CMS blob stored in the ZIP comment, followed by a
+6 byte footer. Everything before the comment length field of the EOCD
+record is signed.
+"""
+
+FOOTER_SIZE = 6
+EOCD_HEADER_SIZE = 22
+EOCD_MAGIC = bytes([80, 75, 5, 6])
+
+# ZIP comment is at most 64 KiB, so EOCD record, signature and footer
+# are always within this many bytes from the end of the file
+MAX_EOCD_SIZE = EOCD_HEADER_SIZE + 0xFFFF
+
+
+class SignedTail(object):
+    """
+    EOCD record, signature and footer of a signed file.
+    Args:
+        tail : last bytes of the file, at least the EOCD record and comment
+               (last MAX_EOCD_SIZE bytes, or the whole file if smaller)
+        length : size of the file
+    """
+
+    def __init__(self, tail, length):
+        self.tail = bytes(tail)
+        self.length = length
+
+    @property
+    def footer(self):
+        return bytearray(self.tail[-FOOTER_SIZE:])
+
+    @property
+    def comment_size(self):
+        return self.footer[4] + (self.footer[5] << 8)
+
+    @property
+    def signature_start(self):
+        return self.footer[0] + (self.footer[1] << 8)
+
+    @property
+    def eocd_size(self):
+        return self.comment_size + EOCD_HEADER_SIZE
+
+    @property
+    def eocd(self):
+        return bytearray(self.tail[-self.eocd_size :])
+
+    @property
+    def signed_len(self):
+        return self.length - self.eocd_size + EOCD_HEADER_SIZE - 2
+
+    @property
+    def signature_raw(self):
+        return self.tail[-self.signature_start : -FOOTER_SIZE]
+
+    def check_valid(self):
+        assert self.footer[2] == 255 and self.footer[3] == 255, "Footer has wrong magic"
+        assert (
+            self.signature_start <= self.comment_size
+        ), "Signature start larger than comment"
+        assert (
+            self.signature_start > FOOTER_SIZE
+        ), "Signature inside footer or outside file"
+        assert self.length >= self.eocd_size, "EOCD larger than length"
+        assert self.eocd[0:4] == EOCD_MAGIC, "EOCD has wrong magic"
+        # EOCD and comment are already in memory, scan them for another magic
+        assert (
+            self.eocd.find(EOCD_MAGIC, 1) == -1
+        ), "Multiple EOCD magics; possible exploit"
+        return True
+
+    @property
+    def digest_algorithm(self):
+        """
+        Name of hash algorithm used by the signer, e.g. sha256
+        """
+        # Lazy imports, asn1crypto and oscrypto are slow to import
+        from asn1crypto.algos import DigestAlgorithmId
+        from asn1crypto.cms import ContentInfo
+
+        sig = ContentInfo.load(self.signature_raw)["content"]["signer_infos"][0]
+        return DigestAlgorithmId.map(sig["digest_algorithm"]["algorithm"].dotted)
+
+    def verify_digest(self, pubkey, digest):
+        """
+        Verify signature against digest of the signed part of the file.
+        Raises oscrypto.errors.SignatureError if it does not match.
+        Args:
+            pubkey : path to PEM encoded public key file
+            digest : digest of first signed_len bytes, using digest_algorithm
+        """
+        from asn1crypto.algos import DigestInfo
+        from asn1crypto.cms import ContentInfo
+        from asn1crypto.core import Null
+        from oscrypto.asymmetric import load_public_key, rsa_pkcs1v15_verify
+
+        sig = ContentInfo.load(self.signature_raw)["content"]["signer_infos"][0]
+        sig_contents = sig["signature"].contents
+        with open(pubkey, "rb") as keyfile:
+            keydata = load_public_key(keyfile.read())
+        # Signature is verified against the precomputed digest, wrapped in
+        # DigestInfo the same way PKCS#1 v1.5 does for a hashed message
+        digest_info = DigestInfo(
+            {
+                "digest_algorithm": {
+                    "algorithm": self.digest_algorithm,
+                    "parameters": Null(),
+                },
+                "digest": digest,
+            }
+        )
+        return rsa_pkcs1v15_verify(keydata, sig_contents, digest_info.dump(), "raw")
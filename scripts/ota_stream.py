@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+Single pass over a signed OTA ZIP, read as a stream from the network
+or from disk.
+
+Every byte is hashed once, on the thread reading the stream. The same
+SHA-256 yields both the digest of the signed part of the file (for the
+whole-file signature) and the checksum of the whole file. payload.bin is
+decoded from the same stream, as its data goes by.
+"""
+
+import hashlib
+import logging
+import os
+import queue
+import struct
+import threading
+import zipfile
+
+from ota_signature import MAX_EOCD_SIZE, SignedTail
+from update_payload import STREAM_CHUNK_SIZE, Payload, PayloadError
+
+# Number of chunks read ahead of the consumer of the stream
+STREAM_READ_AHEAD = 8
+
+HTTP_TIMEOUT = 30
+
+
+class StreamHasher(object):
+    """
+    SHA-256 of a stream, also providing the digest of its signed part.
+    Signed part ends in the EOCD record, whose position is only known
+    once the stream has ended. So the last MAX_EOCD_SIZE bytes are held
+    back and hashed when finishing.
+    """
+
+    def __init__(self):
+        self.hasher = hashlib.sha256()
+        self.length = 0
+        self.tail = bytearray()
+
+    def update(self, chunk):
+        self.length += len(chunk)
+        if len(chunk) >= MAX_EOCD_SIZE:
+            chunk = memoryview(chunk)
+            self.hasher.update(self.tail)
+            self.hasher.update(chunk[:-MAX_EOCD_SIZE])
+            self.tail = bytearray(chunk[-MAX_EOCD_SIZE:])
+            return
+        self.tail += chunk
+        excess = len(self.tail) - MAX_EOCD_SIZE
+        if excess > 0:
+            self.hasher.update(memoryview(self.tail)[:excess])
+            del self.tail[:excess]
+
+    def finish(self, signed=True):
+        """
+        Returns SignedTail of the stream, digest of its signed part and
+        SHA-256 of the whole stream.
+        Args:
+            signed : stream must be signed, otherwise the SignedTail and
+                     digest are None
+        """
+        if not signed:
+            self.hasher.update(self.tail)
+            return None, None, self.hasher.hexdigest()
+        signed = SignedTail(self.tail, self.length)
+        signed.check_valid()
+        pending = signed.signed_len - (self.length - len(self.tail))
+        if pending < 0:
+            raise PayloadError("Signed part of stream ends before its tail")
+        self.hasher.update(self.tail[:pending])
+        signed_digest = self.hasher.copy().digest()
+        self.hasher.update(self.tail[pending:])
+        return signed, signed_digest, self.hasher.hexdigest()
+
+
+def file_chunks(path, chunk_size=STREAM_CHUNK_SIZE):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def http_chunks(url, chunk_size=STREAM_CHUNK_SIZE):
+    # Lazy import, requests is only needed for remote OTAs
+    import requests
+
+    with requests.get(url, stream=True, timeout=HTTP_TIMEOUT) as response:
+        response.raise_for_status()
+        yield from response.iter_content(chunk_size=chunk_size)
+
+
+class OtaStream(object):
+    """
+    Forward-only, read-only file over an OTA ZIP read from source.
+    A background thread reads source and hashes it with a StreamHasher,
+    so that reading and hashing overlap with decoding.
+    Seeking is only possible forwards, skipped bytes are still hashed.
+    Args:
+        source : path or http(s) URL of OTA ZIP
+    """
+
+    def __init__(self, source, read_ahead=STREAM_READ_AHEAD):
+        self.source = source
+        self.hasher = StreamHasher()
+        self.pos = 0
+        self._chunk = memoryview(b"")
+        self._chunk_pos = 0
+        self._queue = queue.Queue(maxsize=read_ahead)
+        self._stop = threading.Event()
+        if source.startswith(("http://", "https://")):
+            chunks = http_chunks(source)
+        else:
+            chunks = file_chunks(source)
+        self._thread = threading.Thread(target=self._read, args=(chunks,), daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read(self, chunks):
+        try:
+            for chunk in chunks:
+                self.hasher.update(chunk)
+                if not self._put(chunk):
+                    return
+            self._put(None)
+        except Exception as e:
+            self._put(e)
+
+    def _next_chunk(self):
+        chunk = self._queue.get()
+        if isinstance(chunk, Exception):
+            raise chunk
+        if chunk is None:
+            # Keep returning end of stream
+            self._queue.put(None)
+            return False
+        self._chunk = memoryview(chunk)
+        self._chunk_pos = 0
+        return True
+
+    def read(self, size=-1):
+        parts = []
+        while size < 0 or size > 0:
+            if self._chunk_pos == len(self._chunk) and not self._next_chunk():
+                break
+            end = len(self._chunk) if size < 0 else self._chunk_pos + size
+            part = self._chunk[self._chunk_pos : end]
+            self._chunk_pos += len(part)
+            if size > 0:
+                size -= len(part)
+            parts.append(part)
+        data = b"".join(parts)
+        self.pos += len(data)
+        return data
+
+    def skip(self, length):
+        while length > 0:
+            if self._chunk_pos == len(self._chunk) and not self._next_chunk():
+                raise PayloadError("Unexpected end of %s" % self.source)
+            step = min(length, len(self._chunk) - self._chunk_pos)
+            self._chunk_pos += step
+            self.pos += step
+            length -= step
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, pos, whence=os.SEEK_SET):
+        if whence != os.SEEK_SET or pos < self.pos:
+            raise PayloadError(
+                "Cannot seek backwards in stream (%d -> %d)" % (self.pos, pos)
+            )
+        self.skip(pos - self.pos)
+        return self.pos
+
+    def drain(self):
+        """
+        Read (and hash) rest of the stream
+        """
+        while self._next_chunk():
+            self.pos += len(self._chunk)
+            self._chunk_pos = len(self._chunk)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def zip64_sizes(extra, size, compressed_size):
+    """
+    Sizes of a local file header, taken from its ZIP64 extra field
+    """
+    while len(extra) >= 4:
+        header_id, data_len = struct.unpack("<HH", extra[:4])
+        data = extra[4 : 4 + data_len]
+        if header_id == 0x0001:
+            if size == 0xFFFFFFFF:
+                size, = struct.unpack("<Q", data[:8])
+                data = data[8:]
+            if compressed_size == 0xFFFFFFFF:
+                compressed_size, = struct.unpack("<Q", data[:8])
+            return size, compressed_size
+        extra = extra[4 + data_len :]
+    raise PayloadError("ZIP64 extra field missing in local file header")
+
+
+def find_stored_entry(stream, name):
+    """
+    Walk local file headers of stream up to the stored entry name.
+    Entries before it must not use data descriptors, as their size
+    is needed to skip them.
+    Returns (offset, size) of data of the entry in the stream
+    """
+    while True:
+        header = stream.read(zipfile.sizeFileHeader)
+        if (
+            len(header) != zipfile.sizeFileHeader
+            or header[0:4] != zipfile.stringFileHeader
+        ):
+            raise PayloadError("%s not found in %s" % (name, stream.source))
+        flags, method = struct.unpack("<HH", header[6:10])
+        compressed_size, size, name_len, extra_len = struct.unpack(
+            "<IIHH", header[18:30]
+        )
+        entry_name = stream.read(name_len).decode("utf-8", errors="replace")
+        extra = stream.read(extra_len)
+        if 0xFFFFFFFF in (compressed_size, size):
+            size, compressed_size = zip64_sizes(extra, size, compressed_size)
+        if entry_name == name:
+            if method != zipfile.ZIP_STORED:
+                raise PayloadError("%s is compressed, cannot stream it" % name)
+            return stream.tell(), size
+        if flags & 0x08:
+            raise PayloadError(
+                "%s uses a data descriptor, cannot skip it in a stream" % entry_name
+            )
+        logging.debug("Skipping '%s' (%d bytes)" % (entry_name, compressed_size))
+        stream.skip(compressed_size)
+
+
+def check_stream_order(partitions):
+    """
+    Operations are applied in manifest order while the stream goes by,
+    so their data has to be stored in the same order.
+    """
+    end = 0
+    for p in partitions:
+        for operation in p.operations:
+            if not operation.data_length:
+                continue
+            if operation.data_offset < end:
+                raise PayloadError(
+                    "Data of '%s' is not in operation order, cannot stream it"
+                    % p.partition_name
+                )
+            end = operation.data_offset + operation.data_length
+
+
+class StreamPayload(Payload):
+    """
+    Payload read from an OtaStream.
+    The last data blob read whole is kept, so that it can be read
+    again (e.g. hashed, then decoded) without seeking backwards.
+    """
+
+    def __init__(self, payload_file):
+        super().__init__(payload_file)
+        self._blob = None
+
+    def ReadDataBlob(self, offset, length):
+        if self._blob is None or self._blob[0] != (offset, length):
+            self._blob = ((offset, length), super().ReadDataBlob(offset, length))
+        return self._blob[1]
+
+    def IterDataBlob(self, offset, length, chunk_size=STREAM_CHUNK_SIZE):
+        if self._blob is None or self._blob[0] != (offset, length):
+            yield from super().IterDataBlob(offset, length, chunk_size)
+            return
+        blob = memoryview(self._blob[1])
+        for i in range(0, length, chunk_size):
+            yield blob[i : i + chunk_size]
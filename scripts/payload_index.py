@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+Index of the payload of an OTA, saved next to the OTA as
+<ota>.index.json, so that later runs need not parse its manifest.
+
+The index holds the location of payload.bin and its data, and for each
+partition its size and hash (and hash of the source partition of
+incremental payloads), counts of operations by type, compressed (data)
+and uncompressed (output) bytes, and a compact list of its
+operations: [type, data offset, data length, data SHA-256,
+[start block, number of blocks, ...]].
+
+An index is keyed by the SHA-256 of the OTA from <ota>.sha256 (as
+written by fetch) where present. Otherwise it is keyed by size and mtime
+of the OTA and offset of payload.bin in it, which are cheap to check,
+as hashing a multi-GB OTA would cost more than parsing its manifest.
+"""
+
+import collections
+import json
+import logging
+import os
+import zipfile
+
+from update_payload import (
+    BLOCK_SIZE,
+    OPERATION_NAMES,
+    SPARSE_OPERATIONS,
+    MappedPayload,
+    PayloadError,
+    zip_entry_offset,
+)
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".index.json"
+
+# Stand-ins for the protobuf messages used by LazyImage and image_size
+Extent = collections.namedtuple("Extent", ["start_block", "num_blocks"])
+PartitionInfo = collections.namedtuple("PartitionInfo", ["size", "hash"])
+Operation = collections.namedtuple(
+    "Operation",
+    ["type", "data_offset", "data_length", "data_sha256_hash", "dst_extents"],
+)
+Partition = collections.namedtuple(
+    "Partition", ["partition_name", "new_partition_info", "operations"]
+)
+
+
+def index_path(ota):
+    return f"{ota}{INDEX_SUFFIX}"
+
+
+def ota_sha256(ota):
+    """
+    SHA-256 of OTA from its checksum file, None if there is none
+    """
+    checksum_file = f"{ota}.sha256"
+    if not os.path.isfile(checksum_file):
+        return None
+    with open(checksum_file, "r") as f:
+        fields = f.read().split()
+    return fields[0].lower() if fields else None
+
+
+def payload_offset(ota):
+    """
+    Offset of payload.bin in OTA, read from its central directory
+    """
+    with zipfile.ZipFile(ota, "r") as zip_ref:
+        return zip_entry_offset(ota, zip_ref.getinfo("payload.bin"))
+
+
+def partition_entry(partition):
+    """
+    Index entry of PartitionUpdate partition.
+    Output bytes do not count zeroed extents, which are left as holes
+    in images (same as bytes written by extraction).
+    """
+    types = collections.Counter()
+    ops = []
+    data_bytes = 0
+    output_bytes = 0
+    for operation in partition.operations:
+        types[OPERATION_NAMES.get(operation.type, str(operation.type))] += 1
+        extents = []
+        for e in operation.dst_extents:
+            extents += [e.start_block, e.num_blocks]
+            if operation.type not in SPARSE_OPERATIONS:
+                output_bytes += e.num_blocks * BLOCK_SIZE
+        data_bytes += operation.data_length
+        ops.append(
+            [
+                operation.type,
+                operation.data_offset,
+                operation.data_length,
+                operation.data_sha256_hash.hex(),
+                extents,
+            ]
+        )
+    return {
+        "name": partition.partition_name,
+        "size": partition.new_partition_info.size,
+        "hash": partition.new_partition_info.hash.hex(),
+        "old_hash": partition.old_partition_info.hash.hex(),
+        "operations": len(ops),
+        "types": dict(sorted(types.items())),
+        "data_bytes": data_bytes,
+        "output_bytes": output_bytes,
+        "ops": ops,
+    }
+
+
+def build_index(ota, payload, key=None):
+    """
+    Index of initialized payload (MappedPayload of payload.bin in OTA)
+    Args:
+        ota : path to OTA ZIP
+        payload : initialized MappedPayload
+        key : SHA-256 of OTA (default: from its checksum file, see ota_sha256)
+    """
+    st = os.stat(ota)
+    manifest = payload.manifest
+    return {
+        "version": INDEX_VERSION,
+        "ota_sha256": key or ota_sha256(ota),
+        "ota_size": st.st_size,
+        "ota_mtime_ns": st.st_mtime_ns,
+        "payload": {
+            "offset": payload.payload_file.offset,
+            "size": payload.payload_file.size,
+            "version": payload.header.version,
+            "manifest_size": payload.header.manifest_len,
+            "metadata_signature_size": payload.header.metadata_signature_len,
+            "data_offset": payload.data_offset,
+            "block_size": manifest.block_size,
+            "minor_version": manifest.minor_version,
+        },
+        "partitions": [partition_entry(p) for p in manifest.partitions],
+    }
+
+
+def save_index(ota, index):
+    """
+    Write index next to OTA. Failures are logged, the index is only
+    an optimization.
+    """
+    path = index_path(ota)
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_file, "w+") as f:
+            json.dump(index, f, separators=(",", ":"))
+        os.replace(tmp_file, path)
+    except OSError as e:
+        logging.warning("Failed to save payload index %s - %s", path, e)
+
+
+def load_index(ota):
+    """
+    Saved index of OTA, None if there is none or it is not of this OTA
+    """
+    try:
+        with open(index_path(ota), "r") as f:
+            index = json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        logging.warning("Ignoring invalid payload index of %s", ota)
+        return None
+    if index.get("version") != INDEX_VERSION:
+        return None
+    checksum = ota_sha256(ota)
+    if checksum is not None:
+        # OTA may have been replaced by one with the same size and mtime
+        return index if checksum == index["ota_sha256"] else None
+    st = os.stat(ota)
+    if (st.st_size, st.st_mtime_ns) != (index["ota_size"], index["ota_mtime_ns"]):
+        return None
+    try:
+        if payload_offset(ota) != index["payload"]["offset"]:
+            return None
+    except (KeyError, zipfile.BadZipFile):
+        return None
+    return index
+
+
+def open_payload(ota):
+    """
+    Open payload.bin of OTA, using its saved index if there is one,
+    otherwise parsing its manifest and saving an index.
+    Returns (MappedPayload, index). The payload is only initialized
+    (has a manifest) if there was no index.
+    """
+    index = load_index(ota)
+    if index is not None:
+        logging.debug("Using payload index of %s", ota)
+        f = open(ota, "rb")
+        try:
+            payload = MappedPayload(
+                f, index["payload"]["offset"], index["payload"]["size"]
+            )
+        except Exception:
+            f.close()
+            raise
+        payload.data_offset = index["payload"]["data_offset"]
+        payload.owned_file = f
+        return payload, index
+
+    with zipfile.ZipFile(ota, "r") as zip_ref:
+        info = zip_ref.getinfo("payload.bin")
+    if info.compress_type != zipfile.ZIP_STORED:
+        raise PayloadError("payload.bin in %s is compressed" % ota)
+    f = open(ota, "rb")
+    try:
+        payload = MappedPayload(f, zip_entry_offset(ota, info), info.file_size)
+        payload.Init()
+    except Exception:
+        f.close()
+        raise
+    payload.owned_file = f
+    index = build_index(ota, payload)
+    save_index(ota, index)
+    return payload, index
+
+
+def find_entry(index, name):
+    for entry in index["partitions"]:
+        if entry["name"] == name:
+            return entry
+    raise PayloadError(
+        "Partition %s not in payload (available: %s)"
+        % (name, ", ".join(e["name"] for e in index["partitions"]))
+    )
+
+
+def partition_of(index, name):
+    """
+    Partition name of index, usable in place of its PartitionUpdate
+    by LazyImage, which looks up operations by block range in it
+    """
+    entry = find_entry(index, name)
+    operations = [
+        Operation(
+            op_type,
+            data_offset,
+            data_length,
+            bytes.fromhex(data_hash),
+            [Extent(*extents[i : i + 2]) for i in range(0, len(extents), 2)],
+        )
+        for op_type, data_offset, data_length, data_hash, extents in entry["ops"]
+    ]
+    return Partition(
+        entry["name"],
+        PartitionInfo(entry["size"], bytes.fromhex(entry["hash"])),
+        operations,
+    )
+
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Local record of the last processed build of each device, so that runs
+can stop before downloading anything if the latest build was already
+processed (see fetch --check).
+
+The state is a JSON file, shared by all devices:
+    {"version": 1, "devices": {"<device>": {"tag": <REL_TAG>,
+     "sha256": ..., "processed": <unix time>}}}
+
+Configured with environment variables:
+    LOS_STATE_FILE : state file (default: releases.json in the cache directory)
+"""
+
+import logging
+import time
+
+from json_store import JsonStore
+
+STATE_VERSION = 1
+STATE_FILE_NAME = "releases.json"
+
+# Exit status of fetch --check when the latest build was already processed
+EXIT_UNCHANGED = 3
+
+
+class ReleaseState(JsonStore):
+    """
+    Args:
+        path : path to state file
+    """
+
+    VERSION = STATE_VERSION
+    DESCRIPTION = "release state"
+    ENVIRONMENT = "LOS_STATE_FILE"
+    FILE_NAME = STATE_FILE_NAME
+
+    def tag(self, device):
+        """
+        REL_TAG of last processed build of device, None if there is none
+        """
+        entry = self._load()["devices"].get(device)
+        return entry["tag"] if entry else None
+
+    def record(self, device, tag, sha256=None):
+        """
+        Record build tag (REL_TAG) of device as processed
+        """
+        with self._locked():
+            data = self._load()
+            data["devices"][device] = {
+                "tag": tag,
+                "sha256": sha256,
+                "processed": time.time(),
+            }
+            self._save(data)
+        logging.info("Recorded %s as last processed build of %s", tag, device)
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+Partial download of OTA payloads over HTTP range requests.
+
+Only the ZIP central directory, the payload header and manifest, and
+the data of operations of wanted partitions are downloaded. They are
+written at their original offsets into a sparse local payload.bin,
+which can then be extracted as usual.
+"""
+
+import concurrent.futures
+import io
+import logging
+import os
+import zipfile
+
+import requests
+
+from update_payload import (
+    FileView,
+    Payload,
+    select_partitions,
+    zip_entry_offset,
+)
+
+# Minimum size of a range request made by HttpFile
+HTTP_READ_AHEAD = 64 * 1024
+
+# Ranges separated by less than this are fetched with a single request
+RANGE_MERGE_GAP = 256 * 1024
+
+# Size of chunks streamed from a range response to disk
+HTTP_CHUNK_SIZE = 1024 * 1024
+
+HTTP_TIMEOUT = 30
+
+
+class RemoteError(Exception):
+    pass
+
+
+class HttpFile(io.RawIOBase):
+    """
+    Seekable, read-only file backed by HTTP range requests.
+    Small reads are served from a read-ahead buffer of HTTP_READ_AHEAD bytes.
+    Redirects (e.g. to a download mirror) are resolved once, so that all
+    ranges are fetched from the same server.
+    Args:
+        url : URL of the file. Server must support range requests
+    """
+
+    def __init__(self, url, timeout=HTTP_TIMEOUT):
+        super().__init__()
+        self.timeout = timeout
+        response = requests.head(url, allow_redirects=True, timeout=timeout)
+        response.raise_for_status()
+        self.url = response.url
+        if "Content-Length" not in response.headers:
+            raise RemoteError("Server did not send size of %s" % url)
+        self.size = int(response.headers["Content-Length"])
+        self.pos = 0
+        self.requests = 0
+        self.bytes_fetched = 0
+        self._buffer_offset = 0
+        self._buffer = b""
+
+    def _get(self, offset, length, stream=False):
+        headers = {"Range": "bytes=%d-%d" % (offset, offset + length - 1)}
+        response = requests.get(
+            self.url, headers=headers, stream=stream, timeout=self.timeout
+        )
+        response.raise_for_status()
+        if response.status_code != 206:
+            response.close()
+            raise RemoteError("Server does not support range requests: %s" % self.url)
+        self.requests += 1
+        return response
+
+    def fetch(self, offset, length):
+        """
+        Fetch exactly length bytes at offset with a single request
+        """
+        with self._get(offset, length) as response:
+            data = response.content
+        if len(data) != length:
+            raise RemoteError(
+                "Short range response at %d (%d of %d bytes)"
+                % (offset, len(data), length)
+            )
+        self.bytes_fetched += length
+        return data
+
+    def copy_range(self, offset, length, fd, dest_offset):
+        """
+        Stream length bytes at offset to fd at dest_offset
+        """
+        written = 0
+        with self._get(offset, length, stream=True) as response:
+            for chunk in response.iter_content(chunk_size=HTTP_CHUNK_SIZE):
+                chunk = chunk[: length - written]
+                os.pwrite(fd, chunk, dest_offset + written)
+                written += len(chunk)
+        if written != length:
+            raise RemoteError(
+                "Short range response at %d (%d of %d bytes)" % (offset, written, length)
+            )
+        self.bytes_fetched += length
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, pos, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            pos += self.pos
+        elif whence == os.SEEK_END:
+            pos += self.size
+        if pos < 0:
+            raise ValueError("Negative seek position %d" % pos)
+        self.pos = pos
+        return self.pos
+
+    def readinto(self, b):
+        length = min(len(b), self.size - self.pos)
+        if length <= 0:
+            return 0
+        start = self.pos - self._buffer_offset
+        if start < 0 or start + length > len(self._buffer):
+            fetch = min(max(length, HTTP_READ_AHEAD), self.size - self.pos)
+            self._buffer = self.fetch(self.pos, fetch)
+            self._buffer_offset = self.pos
+            start = 0
+        b[:length] = self._buffer[start : start + length]
+        self.pos += length
+        return length
+
+
+def merge_ranges(ranges, gap=RANGE_MERGE_GAP):
+    """
+    Merge (offset, length) ranges which overlap or are less than
+    gap bytes apart. Returns sorted list of merged ranges.
+    """
+    merged = []
+    for offset, length in sorted(ranges):
+        if merged and offset <= merged[-1][0] + merged[-1][1] + gap:
+            start, merged_length = merged[-1]
+            merged[-1] = (start, max(merged_length, offset + length - start))
+        else:
+            merged.append((offset, length))
+    return merged
+
+
+def fetch_partial_payload(url, dest, partitions=None, connections=4):
+    """
+    Download parts of payload.bin in OTA at url needed to extract
+    partitions into a sparse file dest, keeping original offsets.
+    Args:
+        url : URL of OTA ZIP file
+        dest : path of payload.bin to write
+        partitions : names of partitions to fetch (default: all)
+        connections : number of concurrent range requests
+    Returns size of payload.bin
+    """
+    http = HttpFile(url)
+    logging.info("Reading ZIP directory of %s (%d bytes)" % (http.url, http.size))
+    with zipfile.ZipFile(http, "r") as zip_ref:
+        info = zip_ref.getinfo("payload.bin")
+    payload_offset = zip_entry_offset(http, info)
+
+    payload = Payload(FileView(http, payload_offset, info.file_size))
+    payload.Init()
+    selected = select_partitions(payload.manifest, partitions)
+
+    ranges = [(0, payload.data_offset)]
+    for p in selected:
+        for operation in p.operations:
+            if operation.data_length:
+                ranges.append(
+                    (payload.data_offset + operation.data_offset, operation.data_length)
+                )
+    ranges = merge_ranges(ranges)
+    total = sum(length for _, length in ranges)
+    logging.info(
+        "Fetching %d bytes of %d byte payload in %d ranges for: %s"
+        % (
+            total,
+            info.file_size,
+            len(ranges),
+            ", ".join(p.partition_name for p in selected),
+        )
+    )
+
+    with open(dest, "wb") as dest_f:
+        dest_f.truncate(info.file_size)
+        fd = dest_f.fileno()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=connections) as pool:
+            futures = [
+                pool.submit(http.copy_range, payload_offset + offset, length, fd, offset)
+                for offset, length in ranges
+            ]
+            for done, future in enumerate(
+                concurrent.futures.as_completed(futures), start=1
+            ):
+                future.result()
+                logging.debug("[%d/%d] Fetched range" % (done, len(futures)))
+    logging.info(
+        "Fetched %d bytes in %d requests" % (http.bytes_fetched, http.requests)
+    )
+    return info.file_size
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic OTAs, for benchmarks which must run offline.
+
+Payloads are built from a DeltaArchiveManifest with partitions of given
+sizes, split into a given number of operations, whose types are drawn
+from a weighted mix of REPLACE, REPLACE_XZ, REPLACE_BZ and ZERO.
+Generated data is half random and half zeros in every block, so that it
+compresses about as well as real images do.
+
+OTA ZIPs hold payload.bin stored (uncompressed), like real ones, and can
+be signed with a whole-file signature using a generated key.
+Block based OTAs (transfer list and new data) can be written for images
+too.
+"""
+
+import bz2
+import hashlib
+import lzma
+import random
+import struct
+import zipfile
+
+import metadata_pb2
+from block_image import BLOCK_SIZE
+from update_payload import BRILLO_MAJOR_PAYLOAD_VERSION
+
+DEFAULT_MIX = {"REPLACE": 1, "REPLACE_XZ": 2, "REPLACE_BZ": 1, "ZERO": 1}
+
+COMPRESSORS = {
+    "REPLACE": lambda data: data,
+    "REPLACE_XZ": lzma.compress,
+    "REPLACE_BZ": bz2.compress,
+}
+
+
+class SyntheticOtaError(Exception):
+    pass
+
+
+def parse_mix(text):
+    """
+    Operation mix from text like "REPLACE=1,REPLACE_XZ=2,ZERO=1"
+    """
+    mix = {}
+    for item in filter(None, (i.strip() for i in text.split(","))):
+        name, _, weight = item.partition("=")
+        name = name.strip().upper()
+        if name not in COMPRESSORS and name != "ZERO":
+            raise SyntheticOtaError("Unsupported operation type %s" % name)
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise SyntheticOtaError("Invalid weight of %s" % name)
+    if not any(mix.values()):
+        raise SyntheticOtaError("Operation mix %s is empty" % text)
+    return mix
+
+
+def block_data(rnd, blocks):
+    """
+    Data of blocks, each half random and half zeros
+    """
+    half = BLOCK_SIZE // 2
+    zeros = bytes(half)
+    return b"".join(rnd.randbytes(half) + zeros for _ in range(blocks))
+
+
+def generate_payload(path, partitions, operations=64, mix=None, seed=0):
+    """
+    Write a full payload.bin.
+    Args:
+        path : path to payload.bin to write
+        partitions : dict of partition name to size in bytes
+                     (rounded up to whole blocks)
+        operations : number of operations of each partition
+        mix : dict of operation type name to weight (default: DEFAULT_MIX)
+        seed : seed of generated data, payloads are reproducible
+    Returns dict of partition name to SHA-256 of its image
+    """
+    mix = mix or DEFAULT_MIX
+    types = [t for t in mix if mix[t] > 0]
+    weights = [mix[t] for t in types]
+    rnd = random.Random(seed)
+    manifest = metadata_pb2.DeltaArchiveManifest()
+    manifest.block_size = BLOCK_SIZE
+    manifest.minor_version = 0
+    blobs = []
+    data_size = 0
+    images = {}
+    for name, size in partitions.items():
+        blocks = max(1, -(-size // BLOCK_SIZE))
+        op_blocks = max(1, -(-blocks // operations))
+        partition = manifest.partitions.add()
+        partition.partition_name = name
+        image_hash = hashlib.sha256()
+        for start in range(0, blocks, op_blocks):
+            count = min(op_blocks, blocks - start)
+            type_name = rnd.choices(types, weights)[0]
+            operation = partition.operations.add()
+            operation.type = getattr(metadata_pb2.InstallOperation, type_name)
+            extent = operation.dst_extents.add()
+            extent.start_block = start
+            extent.num_blocks = count
+            if type_name == "ZERO":
+                image_hash.update(bytes(count * BLOCK_SIZE))
+                continue
+            raw = block_data(rnd, count)
+            image_hash.update(raw)
+            data = COMPRESSORS[type_name](raw)
+            operation.data_offset = data_size
+            operation.data_length = len(data)
+            operation.data_sha256_hash = hashlib.sha256(data).digest()
+            blobs.append(data)
+            data_size += len(data)
+        partition.new_partition_info.size = blocks * BLOCK_SIZE
+        partition.new_partition_info.hash = image_hash.digest()
+        images[name] = image_hash.hexdigest()
+
+    raw_manifest = manifest.SerializeToString()
+    with open(path, "wb") as f:
+        f.write(b"CrAU")
+        f.write(struct.pack(">QQI", BRILLO_MAJOR_PAYLOAD_VERSION, len(raw_manifest), 0))
+        f.write(raw_manifest)
+        for blob in blobs:
+            f.write(blob)
+    return images
+
+
+def generate_key(private_key_file, public_key_file):
+    """
+    Generate an RSA key pair for signing OTAs, written PEM encoded
+    """
+    # Lazy import, only needed for signed OTAs
+    from oscrypto import asymmetric
+
+    public, private = asymmetric.generate_pair("rsa", bit_size=2048)
+    with open(private_key_file, "wb") as f:
+        f.write(asymmetric.dump_private_key(private, None, target_ms=10))
+    with open(public_key_file, "wb") as f:
+        f.write(asymmetric.dump_public_key(public))
+
+
+def sign_zip(path, private_key_file):
+    """
+    Add a whole-file signature (see ota_signature) to ZIP at path,
+    which must have no comment.
+    """
+    # Lazy import, only needed for signed OTAs
+    from asn1crypto import cms
+    from oscrypto import asymmetric
+
+    with open(private_key_file, "rb") as f:
+        private = asymmetric.load_private_key(f.read())
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[-22:-18] != b"PK\x05\x06" or data[-2:] != b"\0\0":
+        raise SyntheticOtaError("%s must end with an EOCD record without comment" % path)
+    # Everything before the comment length is signed
+    message = data[:-2]
+    signer = cms.SignerInfo(
+        {
+            "version": "v1",
+            "sid": cms.SignerIdentifier(
+                {
+                    "issuer_and_serial_number": cms.IssuerAndSerialNumber(
+                        {
+                            "issuer": cms.Name.build({"common_name": "synthetic"}),
+                            "serial_number": 1,
+                        }
+                    )
+                }
+            ),
+            "digest_algorithm": {"algorithm": "sha256"},
+            "signature_algorithm": {"algorithm": "rsassa_pkcs1v15"},
+            "signature": asymmetric.rsa_pkcs1v15_sign(private, message, "sha256"),
+        }
+    )
+    signed_data = cms.SignedData(
+        {
+            "version": "v1",
+            "digest_algorithms": [{"algorithm": "sha256"}],
+            "encap_content_info": {"content_type": "data"},
+            "signer_infos": [signer],
+        }
+    )
+    signature = cms.ContentInfo(
+        {"content_type": "signed_data", "content": signed_data}
+    ).dump()
+    # Footer: signature start and comment size, both from the end
+    comment_size = len(signature) + 6
+    comment = signature + struct.pack("<HBBH", comment_size, 0xFF, 0xFF, comment_size)
+    with open(path, "ab") as f:
+        f.truncate(len(message))
+        f.write(struct.pack("<H", len(comment)) + comment)
+
+
+def generate_ota(path, payload, private_key_file=None):
+    """
+    Write an OTA ZIP holding payload.bin, stored like in real OTAs.
+    Signed with private_key_file, if given.
+    """
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("META-INF/com/android/metadata", "ota-type=AB\n")
+        z.write(payload, "payload.bin", compress_type=zipfile.ZIP_STORED)
+        z.writestr("payload_properties.txt", "")
+    if private_key_file is not None:
+        sign_zip(path, private_key_file)
+
+
+def rangeset(ranges):
+    """
+    Rangeset text of (start, end) block ranges
+    """
+    numbers = [n for r in ranges for n in r]
+    return ",".join(str(n) for n in [len(numbers)] + numbers)
+
+
+def generate_block_ota(transfer_list, new_data, size, seed=0):
+    """
+    Write a full block based OTA of an image of size bytes: a version 4
+    transfer list, erasing all blocks and writing new data in ranges,
+    with zeroed ranges in between.
+    Returns SHA-256 of the image
+    """
+    rnd = random.Random(seed)
+    blocks = max(1, -(-size // BLOCK_SIZE))
+    new_ranges = []
+    zero_ranges = []
+    image_hash = hashlib.sha256()
+    with open(new_data, "wb") as f:
+        start = 0
+        while start < blocks:
+            end = min(blocks, start + rnd.randint(1, 256))
+            if rnd.random() < 0.2:
+                zero_ranges.append((start, end))
+                image_hash.update(bytes((end - start) * BLOCK_SIZE))
+            else:
+                new_ranges.append((start, end))
+                data = block_data(rnd, end - start)
+                image_hash.update(data)
+                f.write(data)
+            start = end
+    new_blocks = sum(end - start for start, end in new_ranges)
+    with open(transfer_list, "w") as f:
+        f.write(f"4\n{new_blocks}\n0\n0\n")
+        f.write(f"erase {rangeset([(0, blocks)])}\n")
+        if new_ranges:
+            f.write(f"new {rangeset(new_ranges)}\n")
+        if zero_ranges:
+            f.write(f"zero {rangeset(zero_ranges)}\n")
+    return image_hash.hexdigest()
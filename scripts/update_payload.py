@@ -0,0 +1,631 @@
+# -*- coding: utf-8 -*-
+"""
+Reading and decoding of Android A/B OTA payloads (payload.bin)
+"""
+
+import bisect
+import bz2
+import collections
+import hashlib
+import logging
+import lzma
+import mmap
+import os
+import struct
+import subprocess
+import threading
+import zipfile
+
+import metadata_pb2
+
+BRILLO_MAJOR_PAYLOAD_VERSION = 2
+
+BLOCK_SIZE = 4096
+
+# Size of chunks read from payload and written to images.
+# This bounds memory used per operation regardless of its size.
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Default size of decoded operations kept in memory by LazyImage
+LAZY_IMAGE_CACHE_SIZE = 64 * 1024 * 1024
+
+
+class PayloadError(Exception):
+    pass
+
+
+class FileView(object):
+    """
+    Read-only view of size bytes of a file object starting at offset.
+    Used to read an entry stored (uncompressed) in a ZIP file in place.
+    """
+
+    def __init__(self, file, offset, size):
+        self.file = file
+        self.offset = offset
+        self.size = size
+        self.pos = 0
+
+    def seek(self, pos, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            pos += self.pos
+        elif whence == os.SEEK_END:
+            pos += self.size
+        if pos < 0:
+            raise ValueError("Negative seek position %d" % pos)
+        self.pos = pos
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+    def read(self, size=-1):
+        remaining = max(self.size - self.pos, 0)
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        self.file.seek(self.offset + self.pos)
+        data = self.file.read(size)
+        self.pos += len(data)
+        return data
+
+
+def zip_entry_offset(zip_file, info):
+    """
+    Offset of the data of a stored ZIP entry in zip_file
+    Args:
+        zip_file : path to ZIP file, or a seekable file object
+        info : ZipInfo of the entry
+    """
+    if info.compress_type != zipfile.ZIP_STORED:
+        raise PayloadError("%s is compressed, cannot read in place" % info.filename)
+    if hasattr(zip_file, "read"):
+        zip_file.seek(info.header_offset)
+        header = zip_file.read(zipfile.sizeFileHeader)
+    else:
+        with open(zip_file, "rb") as f:
+            f.seek(info.header_offset)
+            header = f.read(zipfile.sizeFileHeader)
+    if len(header) != zipfile.sizeFileHeader or header[0:4] != zipfile.stringFileHeader:
+        raise PayloadError("Bad local file header for %s" % info.filename)
+    name_len, extra_len = struct.unpack("<HH", header[26:30])
+    return info.header_offset + zipfile.sizeFileHeader + name_len + extra_len
+
+
+class Payload(object):
+    class _PayloadHeader(object):
+        _MAGIC = b"CrAU"
+
+        def __init__(self):
+            self.version = None
+            self.manifest_len = None
+            self.metadata_signature_len = None
+            self.size = None
+
+        def ReadFromPayload(self, payload_file):
+            magic = payload_file.read(4)
+            if magic != self._MAGIC:
+                raise PayloadError("Invalid payload magic: %s" % magic)
+            self.version = struct.unpack(">Q", payload_file.read(8))[0]
+            self.manifest_len = struct.unpack(">Q", payload_file.read(8))[0]
+            self.size = 20
+            self.metadata_signature_len = 0
+            if self.version != BRILLO_MAJOR_PAYLOAD_VERSION:
+                raise PayloadError("Unsupported payload version (%d)" % self.version)
+            self.size += 4
+            self.metadata_signature_len = struct.unpack(">I", payload_file.read(4))[0]
+
+    def __init__(self, payload_file):
+        self.payload_file = payload_file
+        self.header = None
+        self.manifest = None
+        self.data_offset = None
+        self.metadata_signature = None
+        self.metadata_size = None
+
+    def _ReadManifest(self):
+        return self.payload_file.read(self.header.manifest_len)
+
+    def _ReadMetadataSignature(self):
+        self.payload_file.seek(self.header.size + self.header.manifest_len)
+        return self.payload_file.read(self.header.metadata_signature_len)
+
+    def ReadDataBlob(self, offset, length):
+        self.payload_file.seek(self.data_offset + offset)
+        return self.payload_file.read(length)
+
+    def IterDataBlob(self, offset, length, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        Read data blob in chunks of at most chunk_size bytes
+        """
+        self.payload_file.seek(self.data_offset + offset)
+        while length > 0:
+            chunk = self.payload_file.read(min(chunk_size, length))
+            if not chunk:
+                raise PayloadError("Unexpected end of payload")
+            length -= len(chunk)
+            yield chunk
+
+    def Init(self):
+        self.header = self._PayloadHeader()
+        self.header.ReadFromPayload(self.payload_file)
+        manifest_raw = self._ReadManifest()
+        self.manifest = metadata_pb2.DeltaArchiveManifest()
+        self.manifest.ParseFromString(manifest_raw)
+        metadata_signature_raw = self._ReadMetadataSignature()
+        if metadata_signature_raw:
+            self.metadata_signature = metadata_pb2.Signatures()
+            self.metadata_signature.ParseFromString(metadata_signature_raw)
+        self.metadata_size = self.header.size + self.header.manifest_len
+        self.data_offset = self.metadata_size + self.header.metadata_signature_len
+
+
+class MappedPayload(Payload):
+    """
+    Payload backed by a read-only memory map of the file holding it.
+    Data blobs are memoryview slices of the map, so they are written
+    and decompressed without being copied first.
+    """
+
+    def __init__(self, file, offset, size):
+        super().__init__(FileView(file, offset, size))
+        self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)[offset : offset + size]
+        # File closed along with payload (see open_ota_payload)
+        self.owned_file = None
+
+    def ReadDataBlob(self, offset, length):
+        start = self.data_offset + offset
+        if start + length > len(self._view):
+            raise PayloadError("Unexpected end of payload")
+        return self._view[start : start + length]
+
+    def IterDataBlob(self, offset, length, chunk_size=STREAM_CHUNK_SIZE):
+        blob = self.ReadDataBlob(offset, length)
+        for i in range(0, length, chunk_size):
+            yield blob[i : i + chunk_size]
+
+    def close(self):
+        self._view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Slices are still referenced (e.g. from a traceback),
+            # map is released once they are garbage collected.
+            pass
+        if self.owned_file is not None:
+            self.owned_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def decompress_payload(command, data, size):
+    p = subprocess.Popen([command, "-"], stdout=subprocess.PIPE, stdin=subprocess.PIPE)
+    r = p.communicate(data)[0]
+    check_decompressed(len(r), size)
+    return r
+
+
+def check_decompressed(written, size):
+    if written != size:
+        logging.warning("Unexpected size %d %d" % (written, size))
+
+
+def sha256_matches(data, hash):
+    return hashlib.sha256(data).digest() == hash
+
+
+def operation_data_ok(payload_f, operation):
+    """
+    Check data blob of operation against its data_sha256_hash.
+    Operations without data or without hash always pass.
+    """
+    if not operation.data_length or not operation.data_sha256_hash:
+        return True
+    blob = payload_f.ReadDataBlob(operation.data_offset, operation.data_length)
+    return sha256_matches(blob, operation.data_sha256_hash)
+
+
+def extent_ranges(extents):
+    """
+    (start, end) byte ranges of extents
+    """
+    return [
+        (e.start_block * BLOCK_SIZE, (e.start_block + e.num_blocks) * BLOCK_SIZE)
+        for e in extents
+    ]
+
+
+def stream_decompress(new_decompressor, chunks, write):
+    """
+    Decompress chunks and pass output to write.
+    Output is produced in chunks of at most STREAM_CHUNK_SIZE bytes.
+    Concatenated streams are handled like xzcat/bzcat do.
+    Args:
+        new_decompressor : callable returning a decompressor object
+        chunks : iterable of compressed data
+        write : callable consuming decompressed data
+    Returns number of decompressed bytes
+    """
+    decompressor = new_decompressor()
+    written = 0
+    for chunk in chunks:
+        while True:
+            if decompressor.eof:
+                chunk = decompressor.unused_data + chunk
+                if not chunk:
+                    break
+                decompressor = new_decompressor()
+            elif not chunk and decompressor.needs_input:
+                break
+            out = decompressor.decompress(chunk, STREAM_CHUNK_SIZE)
+            chunk = b""
+            write(out)
+            written += len(out)
+    return written
+
+
+DECOMPRESSORS = {
+    metadata_pb2.InstallOperation.REPLACE_XZ: lzma.LZMADecompressor,
+    metadata_pb2.InstallOperation.REPLACE_BZ: bz2.BZ2Decompressor,
+}
+
+
+EXTERNAL_DECOMPRESSORS = {
+    metadata_pb2.InstallOperation.REPLACE_XZ: "xzcat",
+    metadata_pb2.InstallOperation.REPLACE_BZ: "bzcat",
+}
+
+
+# Names of operation types, by type
+OPERATION_NAMES = {
+    number: name for name, number in metadata_pb2.InstallOperation.Type.items()
+}
+
+# Operations leaving their dst extents zeroed, these carry no data
+SPARSE_OPERATIONS = (
+    metadata_pb2.InstallOperation.ZERO,
+    metadata_pb2.InstallOperation.DISCARD,
+)
+
+
+# Operations reading src_extents of the source (old) image of the partition
+SOURCE_OPERATIONS = (
+    metadata_pb2.InstallOperation.SOURCE_COPY,
+    metadata_pb2.InstallOperation.SOURCE_BSDIFF,
+)
+
+# Operations of in-place deltas (minor version 1), reading src_extents of
+# the image being updated, which starts as a copy of the old image
+IN_PLACE_OPERATIONS = (
+    metadata_pb2.InstallOperation.MOVE,
+    metadata_pb2.InstallOperation.BSDIFF,
+)
+
+# Operations whose data is a bsdiff patch of their source data
+DIFF_OPERATIONS = (
+    metadata_pb2.InstallOperation.BSDIFF,
+    metadata_pb2.InstallOperation.SOURCE_BSDIFF,
+)
+
+
+def is_delta(partition):
+    """
+    Whether partition is updated from a source image
+    """
+    return any(
+        o.type in SOURCE_OPERATIONS + IN_PLACE_OPERATIONS for o in partition.operations
+    )
+
+
+def is_in_place(partition):
+    """
+    Whether partition is updated in place
+    """
+    return any(o.type in IN_PLACE_OPERATIONS for o in partition.operations)
+
+
+def read_source(fd, operation):
+    """
+    Read source data of operation (src_extents) from fd and check it
+    against src_sha256_hash. Data is truncated to src_length, if set.
+    """
+    data = bytearray()
+    for start, end in extent_ranges(operation.src_extents):
+        chunk = os.pread(fd, end - start, start)
+        # Past the end of a short image
+        data += chunk + bytes(end - start - len(chunk))
+    if operation.src_sha256_hash and not sha256_matches(
+        data, operation.src_sha256_hash
+    ):
+        raise PayloadError("Source data does not match, wrong source image?")
+    if operation.src_length:
+        del data[operation.src_length :]
+    return data
+
+
+BSDIFF_MAGIC = b"BSDIFF40"
+BSDF2_MAGIC = b"BSDF2"
+BSDIFF_HEADER_SIZE = 32
+
+# Compression of BSDF2 streams (control, diff and extra)
+BSDF2_NONE = 0
+BSDF2_BZ2 = 1
+BSDF2_BROTLI = 2
+
+
+def _offtin(buf):
+    """
+    Decode a bsdiff integer (little endian, sign and magnitude)
+    """
+    value = int.from_bytes(bytes(buf[:7]) + bytes([buf[7] & 0x7F]), "little")
+    return -value if buf[7] & 0x80 else value
+
+
+def _bsdiff_decompress(compression, data):
+    if compression == BSDF2_NONE:
+        return data
+    if compression == BSDF2_BZ2:
+        return bz2.decompress(data)
+    if compression == BSDF2_BROTLI:
+        # Lazy import, brotli is only needed for some BSDF2 patches
+        try:
+            import brotli
+        except ImportError:
+            raise PayloadError("brotli is required for this patch but not installed")
+        return brotli.decompress(bytes(data))
+    raise PayloadError("Unknown BSDF2 compression (%d)" % compression)
+
+
+def add_bytes(a, b):
+    """
+    Bytewise a + b, modulo 256. Bytes are added as one big integer,
+    masking out carries between bytes.
+    """
+    n = len(a)
+    low = int.from_bytes(b"\x7f" * n, "little")
+    high = int.from_bytes(b"\x80" * n, "little")
+    x = int.from_bytes(a, "little")
+    y = int.from_bytes(b, "little")
+    total = ((x & low) + (y & low)) ^ ((x ^ y) & high)
+    return total.to_bytes(n, "little")
+
+
+def bspatch(old, patch):
+    """
+    Apply a bsdiff patch (BSDIFF40, or BSDF2 as used by update_engine)
+    Args:
+        old : source data
+        patch : patch data
+    Returns patched data
+    """
+    header = bytes(patch[:BSDIFF_HEADER_SIZE])
+    if header[:8] == BSDIFF_MAGIC:
+        compression = (BSDF2_BZ2,) * 3
+    elif header[:5] == BSDF2_MAGIC:
+        compression = tuple(header[5:8])
+    else:
+        raise PayloadError("Unknown bsdiff patch format")
+    ctrl_len = _offtin(header[8:16])
+    diff_len = _offtin(header[16:24])
+    new_size = _offtin(header[24:32])
+    if ctrl_len < 0 or diff_len < 0 or new_size < 0:
+        raise PayloadError("Corrupt bsdiff patch header")
+    ctrl_end = BSDIFF_HEADER_SIZE + ctrl_len
+    ctrl = _bsdiff_decompress(compression[0], patch[BSDIFF_HEADER_SIZE:ctrl_end])
+    diff = _bsdiff_decompress(compression[1], patch[ctrl_end : ctrl_end + diff_len])
+    extra = _bsdiff_decompress(compression[2], patch[ctrl_end + diff_len :])
+
+    new = bytearray(new_size)
+    old_pos = new_pos = diff_pos = extra_pos = 0
+    for i in range(0, len(ctrl) - 23, 24):
+        if new_pos >= new_size:
+            break
+        x = _offtin(ctrl[i : i + 8])
+        y = _offtin(ctrl[i + 8 : i + 16])
+        z = _offtin(ctrl[i + 16 : i + 24])
+        if (
+            x < 0
+            or y < 0
+            or new_pos + x + y > new_size
+            or diff_pos + x > len(diff)
+            or extra_pos + y > len(extra)
+        ):
+            raise PayloadError("Corrupt bsdiff patch control data")
+        # Diff bytes are added to old data where there is some
+        new[new_pos : new_pos + x] = diff[diff_pos : diff_pos + x]
+        start = max(old_pos, 0)
+        end = min(old_pos + x, len(old))
+        if start < end:
+            at = new_pos + start - old_pos
+            new[at : at + end - start] = add_bytes(
+                new[at : at + end - start], old[start:end]
+            )
+        diff_pos += x
+        new_pos += x
+        old_pos += x
+        new[new_pos : new_pos + y] = extra[extra_pos : extra_pos + y]
+        extra_pos += y
+        new_pos += y
+        old_pos += z
+    if new_pos != new_size:
+        raise PayloadError(
+            "Truncated bsdiff patch (%d of %d bytes)" % (new_pos, new_size)
+        )
+    return new
+
+
+def image_size(partition):
+    """
+    Size of the image of a partition
+    (new_partition_info.size, or the end of the last dst extent if larger)
+    """
+    size = partition.new_partition_info.size
+    for operation in partition.operations:
+        for start, end in extent_ranges(operation.dst_extents):
+            size = max(size, end)
+    return size
+
+
+def open_ota_payload(zip_file):
+    """
+    Open payload.bin stored in OTA zip_file in place
+    Returns initialized MappedPayload, closing it closes zip_file
+    """
+    with zipfile.ZipFile(zip_file, "r") as zip_ref:
+        info = zip_ref.getinfo("payload.bin")
+    offset = zip_entry_offset(zip_file, info)
+    f = open(zip_file, "rb")
+    try:
+        payload = MappedPayload(f, offset, info.file_size)
+        payload.Init()
+    except Exception:
+        f.close()
+        raise
+    payload.owned_file = f
+    return payload
+
+
+def select_partitions(manifest, names):
+    """
+    Select partitions to extract from manifest.
+    All partitions are selected if names is empty.
+    """
+    if not names:
+        return list(manifest.partitions)
+    available = [p.partition_name for p in manifest.partitions]
+    missing = sorted(set(names) - set(available))
+    if missing:
+        raise PayloadError(
+            "Partition(s) not in payload: %s (available: %s)"
+            % (", ".join(missing), ", ".join(available))
+        )
+    return [p for p in manifest.partitions if p.partition_name in names]
+
+
+def find_partition(manifest, name):
+    """
+    PartitionUpdate of partition name in manifest
+    """
+    for p in manifest.partitions:
+        if p.partition_name == name:
+            return p
+    raise PayloadError(
+        "Partition %s not in payload (available: %s)"
+        % (name, ", ".join(p.partition_name for p in manifest.partitions))
+    )
+
+
+class LazyImage(object):
+    """
+    Read-only view of a partition image, decoded from payload on demand.
+    A read looks up operations covering the requested range in an index of
+    dst extents sorted by block and decodes only those. Decoded operations
+    are kept in a LRU cache of at most cache_size bytes.
+    Provides read_at(offset, length), like fsimage.ImageFile.
+    Reads may be made from several threads.
+    Args:
+        payload : initialized MappedPayload
+        partition : PartitionUpdate of the image
+        cache_size : bytes of decoded operations to keep in memory
+    """
+
+    def __init__(self, payload, partition, cache_size=LAZY_IMAGE_CACHE_SIZE):
+        self.payload = payload
+        self.partition = partition
+        self.size = image_size(partition)
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = collections.OrderedDict()
+        self._cached = 0
+        self._lock = threading.Lock()
+        # (start byte, end byte, operation index, offset in operation output)
+        index = []
+        for i, operation in enumerate(partition.operations):
+            pos = 0
+            for start, end in extent_ranges(operation.dst_extents):
+                index.append((start, end, i, pos))
+                pos += end - start
+        index.sort()
+        self._index = index
+        self._starts = [entry[0] for entry in index]
+
+    def _decode(self, operation):
+        """
+        Decoded output of operation, covering all of its dst extents
+        """
+        blob = self.payload.ReadDataBlob(operation.data_offset, operation.data_length)
+        if operation.data_sha256_hash and not sha256_matches(
+            blob, operation.data_sha256_hash
+        ):
+            raise PayloadError("Hash mismatch in data of operation")
+        if operation.type == metadata_pb2.InstallOperation.REPLACE:
+            # Slice of the payload mmap, nothing to decode
+            return blob
+        if operation.type in DECOMPRESSORS:
+            out = []
+            chunks = (
+                blob[i : i + STREAM_CHUNK_SIZE]
+                for i in range(0, len(blob), STREAM_CHUNK_SIZE)
+            )
+            stream_decompress(DECOMPRESSORS[operation.type], chunks, out.append)
+            return b"".join(out)
+        raise PayloadError("Unhandled operation type (%d)" % operation.type)
+
+    def _operation_data(self, index):
+        # The lock only guards the cache, operations are decoded outside
+        # of it. Threads missing the same operation each decode it.
+        with self._lock:
+            data = self._cache.get(index)
+            if data is not None:
+                self.hits += 1
+                self._cache.move_to_end(index)
+                return data
+            self.misses += 1
+        data = self._decode(self.partition.operations[index])
+        if isinstance(data, bytes):
+            with self._lock:
+                if index not in self._cache:
+                    self._cache[index] = data
+                    self._cached += len(data)
+                while self._cached > self.cache_size and len(self._cache) > 1:
+                    _, evicted = self._cache.popitem(last=False)
+                    self._cached -= len(evicted)
+        return data
+
+    def read_at(self, offset, length):
+        """
+        Read length bytes at offset. Blocks not written by any
+        operation read as zeros.
+        """
+        if offset + length > self.size:
+            raise PayloadError(
+                "Read past end of image at %d (+%d)" % (offset, length)
+            )
+        out = bytearray(length)
+        view = memoryview(out)
+        end = offset + length
+        i = max(bisect.bisect_right(self._starts, offset) - 1, 0)
+        while i < len(self._index):
+            start, extent_end, op_index, op_offset = self._index[i]
+            i += 1
+            if start >= end:
+                break
+            if extent_end <= offset:
+                continue
+            if self.partition.operations[op_index].type in SPARSE_OPERATIONS:
+                continue
+            lo = max(offset, start)
+            hi = min(end, extent_end)
+            data = self._operation_data(op_index)
+            chunk = data[op_offset + lo - start : op_offset + hi - start]
+            view[lo - offset : lo - offset + len(chunk)] = chunk
+        return bytes(out)
+
+    def close(self):
+        self._cache.clear()
+        self.payload.close()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import os
+
+from artifact_cache import ArtifactCache
+
+KIB = 1024
+
+
+def key(n):
+    return "%064x" % n
+
+
+def make_file(path, size):
+    with open(path, "wb") as f:
+        f.write(os.urandom(size))
+    return str(path)
+
+
+def set_atime(cache, kind, n, atime):
+    path = cache.path(kind, key(n))
+    os.utime(path, ns=(atime * 10**9, path.stat().st_mtime_ns))
+
+
+def test_evicts_least_recently_used_entries_over_budget(tmp_path):
+    cache = ArtifactCache(tmp_path / "cache", 3 * 64 * KIB)
+    for n in range(3):
+        src = make_file(tmp_path / f"{n}.img", 64 * KIB)
+        assert cache.store("image", key(n), src)
+        # Only the cache holds the entry
+        os.unlink(src)
+        set_atime(cache, "image", n, 1000 + n)
+    # Use the oldest entry, the second one becomes least recently used
+    assert cache.lookup("image", key(0)) is not None
+
+    src = make_file(tmp_path / "3.img", 64 * KIB)
+    cache.store("image", key(3), src)
+    os.unlink(src)
+    cache.evict()
+
+    assert [n for n in range(4) if cache.lookup("image", key(n))] == [0, 2, 3]
+
+
+def test_linked_entries_are_not_counted(tmp_path):
+    cache = ArtifactCache(tmp_path / "cache", 64 * KIB)
+    outputs = []
+    for n in range(3):
+        # Outputs are kept, entries are links to them
+        outputs.append(make_file(tmp_path / f"{n}.img", 64 * KIB))
+        cache.store("image", key(n), outputs[-1])
+        set_atime(cache, "image", n, 1000 + n)
+    cache.evict()
+    assert all(cache.lookup("image", key(n)) for n in range(3))
+
+    # Once outputs are removed, entries count against the budget
+    for output in outputs:
+        os.unlink(output)
+    cache.evict()
+    assert [n for n in range(3) if cache.lookup("image", key(n))] == [2]
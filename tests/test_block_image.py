@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import os
+
+import pytest
+
+from block_image import BLOCK_SIZE, sdat2img
+
+
+def blocks(*values):
+    return b"".join(bytes([v]) * BLOCK_SIZE for v in values)
+
+
+# Ranges of new data are out of order, new data is laid out in the
+# order of the ranges. A later zero command clears blocks written before.
+TRANSFER_LIST = """4
+6
+0
+0
+erase 2,0,10
+new 6,6,8,0,2,3,5
+zero 2,4,7
+"""
+NEW_DATA = blocks(1, 2, 3, 4, 5, 6)
+#              0  1  2  3  4  5  6  7  8  9
+IMAGE = blocks(3, 4, 0, 5, 0, 0, 0, 2, 0, 0)
+
+
+@pytest.mark.parametrize("compressed", [False, True], ids=["plain", "brotli"])
+def test_sdat2img(tmp_path, compressed):
+    transfer_list = tmp_path / "system.transfer.list"
+    transfer_list.write_text(TRANSFER_LIST)
+    new_data = tmp_path / "system.new.dat"
+    if compressed:
+        brotli = pytest.importorskip("brotli")
+        new_data = tmp_path / "system.new.dat.br"
+        new_data.write_bytes(brotli.compress(NEW_DATA))
+    else:
+        new_data.write_bytes(NEW_DATA)
+    output = tmp_path / "system.img"
+    output.write_bytes(b"previous")
+
+    assert sdat2img(str(transfer_list), str(new_data), str(output)) == len(NEW_DATA)
+    # Image ends with the last block of any command, erased blocks are holes
+    assert output.read_bytes() == IMAGE
+    assert os.stat(output).st_blocks * 512 < os.path.getsize(output)
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import build_index
+from build_index import BuildIndex, BuildIndexError
+
+ROW = (
+    "<tr><td>nightly</td><td>{version}</td>"
+    '<td><a href="https://example.org/{name}">{name}</a></td>'
+    "<td>1 GB</td><td></td><td></td><td>{date}</td></tr>"
+)
+
+
+def download_page(*builds):
+    rows = "".join(
+        ROW.format(version=version, date=date, name=f"lineage-{version}-{date}.zip")
+        for version, date in builds
+    )
+    return (
+        "<html><body><table><tr><th>Type</th></tr>"
+        f"{rows}</table><p>Rest of page</p></body></html>"
+    )
+
+
+@pytest.fixture
+def download_server(range_server, monkeypatch):
+    """
+    Directory served as download pages
+    """
+    root, base_url = range_server
+    monkeypatch.setattr(build_index, "DOWNLOAD_PAGE_URL", base_url + "/{device}")
+    return root
+
+
+def test_unchanged_page_keeps_indexed_builds(tmp_path, download_server, monkeypatch):
+    (download_server / "bacon").write_text(
+        download_page(("21.0", "20261011"), ("21.0", "20261004"))
+    )
+    index = BuildIndex(tmp_path / "builds.json")
+    builds = index.refresh("bacon")
+    assert [b["date"] for b in builds] == ["20261011", "20261004"]
+    assert index.entry("bacon")["etag"]
+    index.set_sha256("bacon", builds[0]["url"], "ab" * 32)
+
+    def not_parsed(chunks):
+        raise AssertionError("Unchanged page must not be parsed")
+
+    monkeypatch.setattr(build_index, "parse_download_page", not_parsed)
+    builds = index.refresh("bacon")
+    assert [b["date"] for b in builds] == ["20261011", "20261004"]
+    assert builds[0]["sha256"] == "ab" * 32
+
+
+def test_unchanged_page_without_indexed_builds(tmp_path, download_server, monkeypatch):
+    (download_server / "bacon").write_text(download_page(("21.0", "20261011")))
+    index = BuildIndex(tmp_path / "builds.json")
+    index.refresh("bacon")
+    entry = index.entry("bacon")
+    # Index is reset after the entry was read, server answers 304
+    (tmp_path / "builds.json").unlink()
+    monkeypatch.setattr(index, "entry", lambda device: entry)
+    with pytest.raises(BuildIndexError):
+        index.refresh("bacon")
+    assert not (tmp_path / "builds.json").exists()
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import os
+
+import pytest
+
+KIB = 1024
+
+
+class Interrupted(Exception):
+    pass
+
+
+def test_segmented_download_resumes_after_interruption(
+    tmp_path, range_server, load_script, monkeypatch
+):
+    fetch = load_script("fetch")
+    monkeypatch.setattr(fetch, "DOWNLOAD_SEGMENT_SIZE", 64 * KIB)
+    root, base_url = range_server
+    data = os.urandom(10 * 64 * KIB + 123)
+    (root / "ota.zip").write_bytes(data)
+    checksum_file = tmp_path / "ota.zip.sha256"
+    checksum_file.write_text("%s  ota.zip\n" % hashlib.sha256(data).hexdigest())
+    dest = tmp_path / "ota.zip"
+
+    download_segment = fetch.download_segment
+    fetched = []
+    failing = [5 * 64 * KIB]
+
+    def counted_segment(file_url, fd, offset, length):
+        if offset in failing:
+            raise Interrupted()
+        download_segment(file_url, fd, offset, length)
+        fetched.append(offset)
+
+    monkeypatch.setattr(fetch, "download_segment", counted_segment)
+    with pytest.raises(Interrupted):
+        fetch.dl(str(dest), f"{base_url}/ota.zip", str(checksum_file), connections=2)
+    assert not dest.exists()
+    with open(f"{dest}.part.json") as f:
+        done = json.load(f)["done"]
+    assert 5 not in done
+    assert sorted(fetched) == [i * 64 * KIB for i in done]
+
+    fetched.clear()
+    failing.clear()
+    fetch.dl(str(dest), f"{base_url}/ota.zip", str(checksum_file), connections=2)
+    # Only missing segments are fetched again
+    assert sorted(fetched) == [i * 64 * KIB for i in range(11) if i not in done]
+    assert dest.read_bytes() == data
+    assert not os.path.exists(f"{dest}.part.json")
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import shutil
+import stat
+import struct
+import subprocess
+
+import pytest
+
+import fsimage
+
+KIB = 1024
+
+EROFS_BLOCK = 4096
+EROFS_NULL = 0xFFFFFFFF
+FILE_MODE = stat.S_IFREG | 0o644
+MTIME = 1700000000
+
+
+@pytest.mark.skipif(shutil.which("mke2fs") is None, reason="needs mke2fs")
+def test_copy_sparse_indirect_mapped_file(tmp_path):
+    # 1 KiB blocks: 12 direct blocks, 256 per indirect block
+    chunks = {
+        0: b"a" * 4 * KIB,
+        # Whole single indirect range (blocks 12-267) is a hole,
+        # first block of double indirect range is data
+        268 * KIB: b"b" * KIB,
+        # Second indirect block of double indirect range (blocks 524-779)
+        # is a hole, data again after it
+        800 * KIB: b"c" * 2 * KIB,
+    }
+    size = 900 * KIB
+    src = tmp_path / "src"
+    src.mkdir()
+    sparse = src / "sparse.bin"
+    with open(sparse, "wb") as f:
+        for offset, data in chunks.items():
+            f.seek(offset)
+            f.write(data)
+        f.truncate(size)
+    image = tmp_path / "ext2.img"
+    subprocess.run(
+        ["mke2fs", "-q", "-t", "ext2", "-b", "1024", "-d", str(src), str(image), "4M"],
+        check=True,
+    )
+
+    dest = tmp_path / "copy.bin"
+    hasher = hashlib.sha256()
+    with fsimage.open_image(str(image)) as fs:
+        inode = fs.lookup("sparse.bin")
+        # File is block mapped and has holes
+        assert any(device_offset is None for _, _, device_offset in inode.extents)
+        fs.copy("sparse.bin", str(dest), hasher)
+
+    expected = hashlib.sha256(sparse.read_bytes()).hexdigest()
+    assert os.path.getsize(dest) == size
+    assert hashlib.sha256(dest.read_bytes()).hexdigest() == expected
+    assert hasher.hexdigest() == expected
+
+
+def erofs_compact_inode(layout, mode, size, i_u):
+    return struct.pack("<HHHHIII12x", layout << 1, 0, mode, 1, size, 0, i_u)
+
+
+def erofs_extended_inode(layout, mode, size, i_u, mtime):
+    return struct.pack(
+        "<HHHHQII8xQ24x", (layout << 1) | 1, 0, mode, 0, size, i_u, 0, mtime
+    )
+
+
+def erofs_dir(entries):
+    """
+    Directory block of entries, a list of (name, nid, file type)
+    """
+    names_offset = 12 * len(entries)
+    dirents = b""
+    names = b""
+    for name, nid, file_type in entries:
+        dirents += struct.pack("<QHBx", nid, names_offset + len(names), file_type)
+        names += name.encode()
+    return dirents + names
+
+
+def make_erofs(path, files):
+    """
+    Write an EROFS image of 4 KiB blocks holding files, a dict of name to
+    contents: a flat file, a flat file with its tail inline, and chunk
+    based files with 4 and 8 byte chunk indexes and a hole.
+    Metadata is in block 1, the root directory in block 2.
+    """
+    image = bytearray(16 * EROFS_BLOCK)
+
+    def put(offset, data):
+        image[offset : offset + len(data)] = data
+
+    # Superblock: magic, block size bits, root nid, build time, meta block
+    put(1024, struct.pack("<I", 0xE0F5E1E2))
+    put(1024 + 0x0C, struct.pack("<BxH", 12, 0))
+    put(1024 + 0x18, struct.pack("<Q", MTIME))
+    put(1024 + 0x28, struct.pack("<I", 1))
+    meta = EROFS_BLOCK
+
+    # Flat, blocks 3-4
+    flat = files["flat.bin"]
+    put(meta + 2 * 32, erofs_compact_inode(0, FILE_MODE, len(flat), 3))
+    put(3 * EROFS_BLOCK, flat)
+
+    # Flat inline, block 5 and tail after the inode
+    inline = files["inline.bin"]
+    put(meta + 4 * 32, erofs_compact_inode(2, FILE_MODE, len(inline), 5))
+    put(5 * EROFS_BLOCK, inline[:EROFS_BLOCK])
+    put(meta + 5 * 32, inline[EROFS_BLOCK:])
+
+    # Chunk based, one block chunks at blocks 6, (hole), 7, 8,
+    # 4 byte indexes after the extended inode
+    chunked = files["chunked.bin"]
+    put(meta + 10 * 32, erofs_extended_inode(4, FILE_MODE, len(chunked), 0, MTIME))
+    put(meta + 12 * 32, struct.pack("<4I", 6, EROFS_NULL, 7, 8))
+    for i, block in ((0, 6), (2, 7), (3, 8)):
+        put(block * EROFS_BLOCK, chunked[i * EROFS_BLOCK : (i + 1) * EROFS_BLOCK])
+
+    # Chunk based, two block chunks at blocks 9-10, (hole), 11-12,
+    # 8 byte indexes
+    chunked8 = files["chunked8.bin"]
+    chunk_format = 0x20 | 1
+    put(meta + 14 * 32, erofs_compact_inode(4, FILE_MODE, len(chunked8), chunk_format))
+    indexes = [(0, 0, 9), (0, 0, EROFS_NULL), (0, 0, 11)]
+    put(meta + 15 * 32, b"".join(struct.pack("<HHI", *i) for i in indexes))
+    put(9 * EROFS_BLOCK, chunked8[: 2 * EROFS_BLOCK])
+    put(11 * EROFS_BLOCK, chunked8[4 * EROFS_BLOCK :])
+
+    root = erofs_dir(
+        [
+            (".", 0, 2),
+            ("..", 0, 2),
+            ("chunked.bin", 10, 1),
+            ("chunked8.bin", 14, 1),
+            ("flat.bin", 2, 1),
+            ("inline.bin", 4, 1),
+        ]
+    )
+    put(meta, erofs_compact_inode(0, stat.S_IFDIR | 0o755, len(root), 2))
+    put(2 * EROFS_BLOCK, root)
+    path.write_bytes(image)
+
+
+def test_copy_erofs_files(tmp_path):
+    files = {
+        "flat.bin": os.urandom(6000),
+        "inline.bin": os.urandom(EROFS_BLOCK + 100),
+        "chunked.bin": os.urandom(EROFS_BLOCK)
+        + bytes(EROFS_BLOCK)
+        + os.urandom(EROFS_BLOCK + 500),
+        "chunked8.bin": os.urandom(2 * EROFS_BLOCK)
+        + bytes(2 * EROFS_BLOCK)
+        + os.urandom(2 * EROFS_BLOCK),
+    }
+    image = tmp_path / "erofs.img"
+    make_erofs(image, files)
+
+    with fsimage.open_image(str(image)) as fs:
+        assert fs.name == "erofs"
+        assert sorted(fs.listdir(fs.inode(fs.root_inode))) == sorted(
+            [".", ".."] + list(files)
+        )
+        for name, data in files.items():
+            dest = tmp_path / name
+            hasher = hashlib.sha256()
+            fs.copy(name, str(dest), hasher)
+            assert dest.read_bytes() == data, name
+            assert hasher.hexdigest() == hashlib.sha256(data).hexdigest()
+            assert os.stat(dest).st_mtime == MTIME
+        # Holes of chunk based files are not mapped
+        assert (EROFS_BLOCK, EROFS_BLOCK, None) not in fs.lookup("chunked.bin").extents
+        assert len(fs.lookup("chunked8.bin").extents) == 2
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import os
+
+import payload_index
+from synthetic_ota import generate_ota, generate_payload
+
+
+def make_ota(tmp_path):
+    payload = tmp_path / "payload.bin"
+    generate_payload(payload, {"system": 64 * 1024}, operations=4)
+    ota = tmp_path / "ota.zip"
+    generate_ota(ota, payload)
+    return str(ota)
+
+
+def test_index_without_checksum_file_is_not_hashed(tmp_path, monkeypatch):
+    ota = make_ota(tmp_path)
+    payload, index = payload_index.open_payload(ota)
+    payload.close()
+    assert index["ota_sha256"] is None
+
+    def no_hashing(*args):
+        raise AssertionError("OTA must not be hashed")
+
+    monkeypatch.setattr("hashlib.sha256", no_hashing)
+    assert payload_index.load_index(ota) == index
+
+
+def test_index_of_changed_ota_is_not_used(tmp_path):
+    ota = make_ota(tmp_path)
+    payload, _ = payload_index.open_payload(ota)
+    payload.close()
+    st = os.stat(ota)
+    os.utime(ota, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+    assert payload_index.load_index(ota) is None
+
+
+def test_index_keyed_by_checksum_file(tmp_path):
+    ota = make_ota(tmp_path)
+    with open(f"{ota}.sha256", "w") as f:
+        f.write("%s  ota.zip\n" % ("ab" * 32))
+    payload, index = payload_index.open_payload(ota)
+    payload.close()
+    assert index["ota_sha256"] == "ab" * 32
+    assert payload_index.load_index(ota) == index
+    with open(f"{ota}.sha256", "w") as f:
+        f.write("%s  ota.zip\n" % ("cd" * 32))
+    assert payload_index.load_index(ota) is None
+
+
+def test_output_bytes_exclude_zeroed_extents(tmp_path):
+    payload = tmp_path / "payload.bin"
+    # 16 blocks, 4 operations of 4 blocks each
+    generate_payload(
+        payload, {"system": 64 * 1024}, operations=4, mix={"REPLACE": 1, "ZERO": 1}
+    )
+    ota = tmp_path / "ota.zip"
+    generate_ota(ota, payload)
+    payload, index = payload_index.open_payload(str(ota))
+    payload.close()
+    entry = index["partitions"][0]
+    assert entry["types"].get("ZERO")
+    assert entry["output_bytes"] == entry["types"]["REPLACE"] * 4 * 4096
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+
+import pytest
+
+import metadata_pb2
+from synthetic_ota import generate_ota, generate_payload
+
+
+def sha256_of(path):
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def test_main_url_mode(tmp_path, range_server, load_script):
+    unpack_payload = load_script("unpack-payload")
+    root, base_url = range_server
+    payload = tmp_path / "payload.bin"
+    images = generate_payload(
+        payload, {"system": 256 * 1024, "vendor": 128 * 1024}, operations=8
+    )
+    generate_ota(root / "ota.zip", payload)
+
+    output_dir = tmp_path / "r1"
+    unpack_payload.main(
+        filename=None,
+        output_dir=str(output_dir),
+        url=f"{base_url}/ota.zip",
+        jobs=2,
+        partitions=["vendor"],
+        strict=True,
+    )
+
+    assert sha256_of(output_dir / "vendor.img") == images["vendor"]
+    assert not (output_dir / "system.img").exists()
+
+
+def test_small_partitions_are_split_for_all_workers(load_script):
+    unpack_payload = load_script("unpack-payload")
+    partition = metadata_pb2.PartitionUpdate()
+    for _ in range(10):
+        partition.operations.add(
+            type=metadata_pb2.InstallOperation.REPLACE, data_length=4096
+        )
+    batches = list(unpack_payload.batch_operations(partition, 4))
+    assert [len(batch) for batch in batches] == [3, 3, 3, 1]
+    # Data size still bounds batches
+    batches = list(unpack_payload.batch_operations(partition, 1, limit=8192))
+    assert [len(batch) for batch in batches] == [2] * 5
+
+
+def test_stream_mode_checksum_mismatch_leaves_no_images(tmp_path, load_script):
+    unpack_payload = load_script("unpack-payload")
+    payload = tmp_path / "payload.bin"
+    generate_payload(payload, {"system": 256 * 1024, "vendor": 128 * 1024})
+    ota = tmp_path / "ota.zip"
+    generate_ota(ota, payload)
+    checksum_file = tmp_path / "ota.zip.sha256"
+    checksum_file.write_text("%s  ota.zip\n" % ("ab" * 32))
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    # Output of a previous run is kept
+    (output_dir / "system.img").write_bytes(b"previous")
+
+    with pytest.raises(SystemExit):
+        unpack_payload.main(
+            filename=str(ota),
+            output_dir=str(output_dir),
+            stream=True,
+            checksum_file=str(checksum_file),
+        )
+
+    assert sorted(os.listdir(output_dir)) == ["system.img"]
+    assert (output_dir / "system.img").read_bytes() == b"previous"
+
+    checksum_file.write_text("%s  ota.zip\n" % sha256_of(ota))
+    unpack_payload.main(
+        filename=str(ota),
+        output_dir=str(output_dir),
+        stream=True,
+        checksum_file=str(checksum_file),
+    )
+    assert sorted(f for f in os.listdir(output_dir) if f.endswith(".img")) == [
+        "system.img",
+        "vendor.img",
+    ]
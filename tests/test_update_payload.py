@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+import bz2
+import hashlib
+
+import pytest
+
+import metadata_pb2
+from update_payload import (
+    BLOCK_SIZE,
+    BSDF2_BROTLI,
+    BSDF2_BZ2,
+    BSDF2_NONE,
+    MappedPayload,
+    PayloadError,
+    add_bytes,
+    bspatch,
+    read_source,
+)
+
+Op = metadata_pb2.InstallOperation
+
+OLD = bytes(range(256)) * 4
+# Seek to 100, add 7 to 300 bytes (wrapping past 255), insert 50 extra
+# bytes, seek back to 0 and copy 200 bytes unchanged
+CONTROLS = [(0, 0, 100), (300, 50, -400), (200, 0, 0)]
+DIFF = bytes([7]) * 300 + bytes(200)
+EXTRA = b"x" * 50
+NEW = bytes((b + 7) % 256 for b in OLD[100:400]) + EXTRA + OLD[:200]
+
+
+def offt(value):
+    buf = bytearray(abs(value).to_bytes(8, "little"))
+    if value < 0:
+        buf[7] |= 0x80
+    return bytes(buf)
+
+
+def make_patch(controls, diff, extra, new_size, compression=None):
+    """
+    bsdiff patch, BSDIFF40 or BSDF2 with compression of its three streams
+    """
+    compressors = {
+        BSDF2_NONE: lambda data: data,
+        BSDF2_BZ2: bz2.compress,
+        BSDF2_BROTLI: lambda data: pytest.importorskip("brotli").compress(data),
+    }
+    if compression is None:
+        magic = b"BSDIFF40"
+        compression = (BSDF2_BZ2,) * 3
+    else:
+        magic = b"BSDF2" + bytes(compression)
+    ctrl = b"".join(offt(v) for control in controls for v in control)
+    streams = [
+        compressors[c](data) for c, data in zip(compression, (ctrl, diff, extra))
+    ]
+    header = magic + offt(len(streams[0])) + offt(len(streams[1])) + offt(new_size)
+    return header + b"".join(streams)
+
+
+def test_add_bytes_wraps_without_carry():
+    assert add_bytes(b"\xff\x01\x80", b"\x01\xff\x80") == b"\x00\x00\x00"
+    assert add_bytes(b"\x10\x20", b"\x01\x02") == b"\x11\x22"
+
+
+@pytest.mark.parametrize(
+    "compression",
+    [
+        None,
+        (BSDF2_NONE, BSDF2_NONE, BSDF2_NONE),
+        (BSDF2_BZ2, BSDF2_NONE, BSDF2_BZ2),
+        (BSDF2_BROTLI, BSDF2_BROTLI, BSDF2_NONE),
+    ],
+    ids=["BSDIFF40", "BSDF2-none", "BSDF2-bz2", "BSDF2-brotli"],
+)
+def test_bspatch(compression):
+    patch = make_patch(CONTROLS, DIFF, EXTRA, len(NEW), compression)
+    assert bytes(bspatch(OLD, patch)) == NEW
+
+
+def test_bspatch_rejects_truncated_patch():
+    patch = make_patch(CONTROLS[:2], DIFF[:300], EXTRA, len(NEW))
+    with pytest.raises(PayloadError):
+        bspatch(OLD, patch)
+
+
+def extents(operation_extents, *ranges):
+    for start, count in ranges:
+        operation_extents.add(start_block=start, num_blocks=count)
+
+
+def blocks(*values):
+    """
+    Blocks of data, each filled with one byte value
+    """
+    return b"".join(bytes([v]) * BLOCK_SIZE for v in values)
+
+
+def test_read_source_rejects_source_hash_mismatch(tmp_path):
+    source = tmp_path / "old.img"
+    source.write_bytes(blocks(1, 2, 3))
+    operation = Op(type=Op.SOURCE_COPY)
+    extents(operation.src_extents, (2, 1), (0, 1))
+    operation.src_sha256_hash = hashlib.sha256(blocks(3, 1)).digest()
+    with open(source, "rb") as f:
+        assert read_source(f.fileno(), operation) == blocks(3, 1)
+        operation.src_sha256_hash = hashlib.sha256(blocks(1, 3)).digest()
+        with pytest.raises(PayloadError):
+            read_source(f.fileno(), operation)
+
+
+def open_blobs(path, blobs):
+    """
+    MappedPayload whose data is blobs, as workers map it
+    """
+    path.write_bytes(b"".join(blobs) or b"\0")
+    f = open(path, "rb")
+    payload = MappedPayload(f, 0, path.stat().st_size)
+    payload.owned_file = f
+    payload.data_offset = 0
+    return payload
+
+
+def add_operation(partition, type, blob=None, offset=0, src=(), dst=()):
+    operation = partition.operations.add(type=type)
+    extents(operation.src_extents, *src)
+    extents(operation.dst_extents, *dst)
+    if blob is not None:
+        operation.data_offset = offset
+        operation.data_length = len(blob)
+        operation.data_sha256_hash = hashlib.sha256(blob).digest()
+    return operation
+
+
+def delta_patch(old, new):
+    """
+    Patch of old into new, all diff bytes
+    """
+    diff = bytes((b - a) % 256 for a, b in zip(old, new))
+    return make_patch([(len(new), 0, 0)], diff, b"", len(new))
+
+
+def test_extract_source_operations(tmp_path, load_script):
+    unpack_payload = load_script("unpack-payload")
+    old = blocks(1, 2, 3, 4)
+    new = blocks(3, 4, 9, 9, 1)
+    source = tmp_path / "old.img"
+    source.write_bytes(old)
+    patch = delta_patch(blocks(1, 2), blocks(9, 9))
+    replace = blocks(1)
+    payload = open_blobs(tmp_path / "blobs.bin", [patch, replace])
+
+    partition = metadata_pb2.PartitionUpdate(partition_name="system")
+    partition.new_partition_info.size = len(new)
+    copy = add_operation(partition, Op.SOURCE_COPY, src=[(2, 2)], dst=[(0, 2)])
+    copy.src_sha256_hash = hashlib.sha256(blocks(3, 4)).digest()
+    add_operation(partition, Op.SOURCE_BSDIFF, patch, src=[(0, 2)], dst=[(2, 2)])
+    add_operation(partition, Op.REPLACE, replace, len(patch), dst=[(4, 1)])
+
+    image = tmp_path / "system.img"
+    with payload:
+        unpack_payload.extract_partition(
+            payload, partition, str(image), sources={"system": str(source)}
+        )
+    assert image.read_bytes() == new
+
+    # Wrong source image
+    source.write_bytes(blocks(4, 3, 2, 1))
+    with open_blobs(tmp_path / "blobs.bin", [patch, replace]) as payload:
+        with pytest.raises(PayloadError, match="Source data does not match"):
+            unpack_payload.extract_partition(
+                payload, partition, str(image), sources={"system": str(source)}
+            )
+
+
+def test_extract_in_place_operations(tmp_path, load_script):
+    unpack_payload = load_script("unpack-payload")
+    source = tmp_path / "old.img"
+    source.write_bytes(blocks(1, 2, 3, 4))
+    patch = delta_patch(blocks(3), blocks(8))
+    payload = open_blobs(tmp_path / "blobs.bin", [patch])
+
+    partition = metadata_pb2.PartitionUpdate(partition_name="system")
+    partition.new_partition_info.size = 5 * BLOCK_SIZE
+    # Overlapping extents, blocks are read before they are overwritten
+    add_operation(partition, Op.MOVE, src=[(0, 3)], dst=[(1, 3)])
+    # Reads the image as left by the MOVE
+    add_operation(partition, Op.BSDIFF, patch, src=[(3, 1)], dst=[(4, 1)])
+
+    image = tmp_path / "system.img"
+    with payload:
+        unpack_payload.extract_partition(
+            payload, partition, str(image), sources={"system": str(source)}
+        )
+    assert image.read_bytes() == blocks(1, 1, 2, 3, 8)
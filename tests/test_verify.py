@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import shutil
+
+import pytest
+
+from synthetic_ota import generate_key, generate_ota, generate_payload
+
+
+@pytest.fixture(scope="module")
+def signed_ota(tmp_path_factory):
+    """
+    Paths of a signed OTA and of the public key it is signed with
+    """
+    tmp_path = tmp_path_factory.mktemp("signed")
+    private_key = tmp_path / "key.pem"
+    public_key = tmp_path / "key.pub.pem"
+    generate_key(private_key, public_key)
+    payload = tmp_path / "payload.bin"
+    generate_payload(payload, {"system": 256 * 1024}, operations=4)
+    ota = tmp_path / "ota.zip"
+    generate_ota(ota, payload, private_key)
+    return ota, public_key
+
+
+def test_verify_signed_ota(signed_ota, load_script):
+    verify = load_script("verify")
+    ota, public_key = signed_ota
+    signed_file = verify.SignedFile(str(ota))
+    assert signed_file.check_valid()
+    signed_file.verify(str(public_key))
+
+
+def test_verify_rejects_tampered_ota(signed_ota, load_script, tmp_path):
+    from oscrypto.errors import SignatureError
+
+    verify = load_script("verify")
+    ota, public_key = signed_ota
+    tampered = tmp_path / "tampered.zip"
+    shutil.copy(ota, tampered)
+    with open(tampered, "r+b") as f:
+        # In payload data, well within the signed part
+        f.seek(64 * 1024)
+        byte = f.read(1)
+        f.seek(64 * 1024)
+        f.write(bytes([byte[0] ^ 0xFF]))
+    signed_file = verify.SignedFile(str(tampered))
+    assert signed_file.check_valid()
+    with pytest.raises(SignatureError):
+        signed_file.verify(str(public_key))